@@ -1,3 +1,8 @@
-from function import Function
+from function import Function, FunctionStack
 from singleprocess import DifferentialEvolutionSP
 from multiprocess import DifferentialEvolutionMP
+from pool import DifferentialEvolutionPool
+from masterworker import DifferentialEvolutionMW
+from steadystate import DifferentialEvolutionAS
+from coevolution import DifferentialEvolutionCC
+from threadpool import DifferentialEvolutionTP
@@ -0,0 +1,196 @@
+import os
+import time
+import numpy as np
+import numpy.random as rnd
+from numpy.lib.format import open_memmap
+
+
+class Checkpoint(object):
+    """
+    Checkpoint of a Differential Evolution run, kept in memory-mapped .npy
+    files of a directory:
+    x.npy     -- population, two slots of shape (pop_size, dim)
+    cost.npy  -- population costs, two slots of shape (pop_size,)
+    rng.npy   -- numpy.random MT19937 keys, two slots of shape (624,)
+    adapt.npy -- adaptation state, two slots of shape (2, m) holding f and
+                 cr of every individual for 'jde' (m is pop_size) or the
+                 success history memories for 'shade' (m is memory_size),
+                 m is 0 without adaptation
+    state.npy -- slot in use (1 or 2, 0 before the first save), counters,
+                 rows of x and values of adapt in use, next 'shade' memory
+                 slot and the rest of numpy.random state
+
+    The files are created by the first save and rewritten in place.
+    A population reduced by min_pop_size fills the first rows of its
+    slot, so the files keep their shape for the whole run. A save writes
+    the slot not in use and flushes it before state.npy is switched to
+    it, so an interrupted save leaves the previous checkpoint intact.
+
+    Public members initialized in constructor:
+    path -- checkpoint directory, created if it doesn't exist
+
+    Example:
+    >>> import tempfile
+    >>> from singleprocess import DifferentialEvolutionSP
+    >>>
+    >>> de = DifferentialEvolutionSP(pop_size=4)
+    >>> de._start_run()
+    >>> de._x, de._cost = rnd.rand(4, 2), rnd.rand(4)
+    >>> de.generations = 10
+    >>>
+    >>> checkpoint = Checkpoint(tempfile.mkdtemp())
+    >>> checkpoint.save(de)
+    >>> state = rnd.get_state()
+    >>>
+    >>> copy = DifferentialEvolutionSP(pop_size=4)
+    >>> copy._start_run()
+    >>> Checkpoint(checkpoint.path).load(copy)
+    >>> (copy._x == de._x).all(), copy.generations
+    (True, 10)
+    >>> value = rnd.rand()
+    >>> rnd.set_state(state)
+    >>> value == rnd.rand()
+    True
+    """
+
+    _fields = ('slot', 'generations', 'evaluations', 'elapsed', 'best_cost',
+               'stagnant', 'size', 'adapt_size', 'memory_next', 'rng_pos',
+               'rng_has_gauss', 'rng_gauss')
+
+    _names = ('x', 'cost', 'rng', 'adapt', 'state')
+
+    def __init__(self, path):
+        """
+        Initializes public member path.
+
+        Arguments:
+        path -- checkpoint directory, created if it doesn't exist
+        """
+        self.path = path
+        self._files = None
+
+    def exists(self):
+        """
+        Returns True if the directory holds a saved checkpoint.
+        """
+        return (os.path.exists(self._file('state')) and
+                np.load(self._file('state'))[0] > 0)
+
+    def save(self, de):
+        """
+        Saves population _x and _cost, generations, evaluations, elapsed
+        time, stagnation and adaptation state of de and numpy.random state.
+
+        Arguments:
+        de -- Differential Evolution algorithm during its run
+        """
+        if self._files is None and self.exists():
+            self._open()
+        shape = (de.pop_size, de._x.shape[1])
+        adapt = self._adaptation(de)
+        adapt_capacity = dict(jde=de.pop_size,
+                              shade=de.memory_size).get(de.adaptation, 0)
+        if (self._files is None or 
+                self._files['x'].shape[1:] != shape or
+                self._files['adapt'].shape[2] != adapt_capacity):
+            self._create(shape, adapt_capacity)
+        files = self._files
+
+        slot = int(files['state'][0]) % 2
+        size = len(de._x)
+        adapt_size = adapt.shape[1]
+        rng, keys, pos, has_gauss, gauss = rnd.get_state()
+        files['x'][slot, :size] = de._x
+        files['cost'][slot, :size] = de._cost
+        files['rng'][slot] = keys
+        files['adapt'][slot, :, :adapt_size] = adapt
+        for name in ('x', 'cost', 'rng', 'adapt'):
+            files[name].flush()
+
+        memory_next = getattr(de, '_memory_next', 0)
+        files['state'][:] = (slot + 1, de.generations, de.evaluations,
+                             time.time() - de._start_time, de._best_cost,
+                             de._stagnant, size, adapt_size, memory_next, pos,
+                             has_gauss, gauss)
+        files['state'].flush()
+
+    def load(self, de):
+        """
+        Restores state saved by save to de and numpy.random.
+
+        Arguments:
+        de -- Differential Evolution algorithm to continue the run
+
+        Exceptions:
+            IOError
+        """
+        if not self.exists():
+            raise IOError('no checkpoint in ' + self.path)
+
+        files = dict((name, np.load(self._file(name), mmap_mode='r'))
+                     for name in self._names)
+        state = dict(zip(self._fields, files['state']))
+        slot = int(state['slot']) - 1
+
+        size = int(state['size'])
+        de._x = np.array(files['x'][slot, :size])
+        de._cost = np.array(files['cost'][slot, :size])
+        de.generations = int(state['generations'])
+        de.evaluations = int(state['evaluations'])
+        de._start_time = time.time() - state['elapsed']
+        de._best_cost = state['best_cost']
+        de._stagnant = int(state['stagnant'])
+        f, cr = np.array(files['adapt'][slot, :, :int(state['adapt_size'])])
+        if de.adaptation == 'jde':
+            de._f_ind, de._cr_ind = f, cr
+        elif de.adaptation == 'shade':
+            de._memory_f, de._memory_cr = f, cr
+            de._memory_next = int(state['memory_next'])
+        rnd.set_state(('MT19937', np.array(files['rng'][slot]),
+                       int(state['rng_pos']), int(state['rng_has_gauss']),
+                       state['rng_gauss']))
+
+    def _open(self):
+        """
+        Opens files of an existing checkpoint for writing.
+        """
+        self._files = dict((name, open_memmap(self._file(name), 'r+'))
+                           for name in self._names)
+
+    def _adaptation(self, de):
+        """
+        Returns (2, m) numpy array of f and cr adaptation state of de.
+        """
+        if de.adaptation == 'jde':
+            return np.array([de._f_ind, de._cr_ind])
+        if de.adaptation == 'shade':
+            return np.array([de._memory_f, de._memory_cr])
+        return np.empty((2, 0))
+
+    def _create(self, shape, adapt_capacity):
+        """
+        Creates files for population of shape (pop_size, dim) and
+        adaptation state of adapt_capacity values of f and cr.
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        self._files = dict(
+            x=open_memmap(self._file('x'), 'w+', float, (2,) + shape),
+            cost=open_memmap(self._file('cost'), 'w+', float, (2, shape[0])),
+            rng=open_memmap(self._file('rng'), 'w+', np.uint32, (2, 624)),
+            adapt=open_memmap(self._file('adapt'), 'w+', float,
+                              (2, 2, adapt_capacity)),
+            state=open_memmap(self._file('state'), 'w+', float,
+                              (len(self._fields),)))
+
+    def _file(self, name):
+        """
+        Returns path of the .npy file name.
+        """
+        return os.path.join(self.path, name + '.npy')
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,288 @@
+import time
+import numpy as np
+import numpy.random as rnd
+
+from function import Function
+from singleprocess import DifferentialEvolutionSP
+
+
+# element types of the population
+DTYPES = ('float64', 'float32')
+
+
+class DifferentialEvolutionCC(DifferentialEvolutionSP):
+    """
+    Differential Evolution algorithm - cooperative coevolution for large
+    scale problems.
+
+    Parameters are split into groups of group_size, randomly regrouped in
+    every cycle. Each group is evolved in turn for group_gen generations
+    by vectorized DE of DifferentialEvolutionSP on its columns of the
+    population, the subpopulation. A point of the subpopulation is
+    evaluated in the context vector, the best point found so far, with
+    the group parameters replaced. Better points of the group update the
+    context vector immediately. Subpopulations are evaluated again when
+    their group starts, since the context vector changed in the meantime,
+    and the group parameters of the context vector replace the worst
+    point. A subpopulation generation counts as one generation for
+    max_gen, stopping criteria, generation hooks and observer.
+
+    The population needs pop_size in proportion to group_size, not to the
+    number of function parameters. Trials of a group are built in place
+    of the mutants and written to one evaluation buffer of shape
+    (pop_size, dim) reused by every evaluation, so a generation allocates
+    arrays of size pop_size*group_size only. x_tol is the exception: its
+    spread is computed over the whole (pop_size, dim) population in every
+    subpopulation generation, a pass over all parameters with arrays of
+    size dim, which costs more than the group generation itself when dim
+    is much larger than group_size.
+
+    Public members initialized in constructor:
+    pop_size   -- population size, integer constant greater than zero
+                  (recomended at least 10x group_size)
+    max_gen    -- maximum generations, integer constant greater than zero
+    cr         -- crossover constant, float in [0,1]
+    f          -- factor of differential amplification, float in [0,2]
+    group_size -- number of parameters of a group, integer greater than
+                  zero
+    group_gen  -- generations of a group in one cycle, integer greater
+                  than zero
+    dtype      -- element type of the population and evaluated points,
+                  one of DTYPES, 'float32' halves the memory
+
+    Keyword arguments mutation (strategy, crossover and p_best), stopping
+    criteria (target_cost, cost_tol, x_tol, stagnation, max_evals and
+    max_time) and instrumentation (observer and observer_interval) are
+    public members described in _DifferentialEvolution. Criteria based on
+    population costs use costs of the current subpopulation. The
+    reference loop (vectorized=False), adaptation, min_pop_size,
+    polishing and checkpointing can't be used, find_min_many and resume
+    raise ValueError.
+
+    Public members set by find_min:
+    stop_reason -- name of the criterion that ended the run
+    generations -- number of generations run
+    evaluations -- number of function evaluations
+
+    Example:
+    >>> def func(x):
+    ...     return (x**2).sum(axis=1)
+    >>>
+    >>> sphere = Function(func, dim=100, lower=(-5.12,)*100,
+    ...                   upper=(5.12,)*100, vectorized=True)
+    >>> de = DifferentialEvolutionCC(pop_size=30, max_gen=2000, group_size=10,
+    ...                              dtype='float32', target_cost=1e-6)
+    >>> minimum, min_point = de.find_min(sphere)
+    >>> de.stop_reason, min_point.dtype, min_point.shape
+    ('target_cost', dtype('float32'), (100,))
+    """
+
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5,
+                 group_size=50, group_gen=10, dtype='float64', **kwargs):
+        """
+        Initializes public members pop_size, max_gen, cr, f, group_size,
+        group_gen and dtype.
+
+        Arguments:
+        pop_size   -- population size, integer constant greater than zero
+        max_gen    -- maximum generations, integer constant greater than
+                      zero
+        cr         -- crossover constant, float in [0,1]
+        f          -- factor of differential amplification, float in [0,2]
+        group_size -- number of parameters of a group, integer greater
+                      than zero
+        group_gen  -- generations of a group in one cycle, integer greater
+                      than zero
+        dtype      -- element type of the population, one of DTYPES
+
+        Keyword arguments:
+        mutation, stopping criteria and instrumentation, see
+        _DifferentialEvolution
+
+        Exceptions:
+            ValueError
+        """
+
+        super(DifferentialEvolutionCC, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
+
+        if not group_size > 0:
+            raise ValueError('group_size must be integer greater than zero')
+
+        if not group_gen > 0:
+            raise ValueError('group_gen must be integer greater than zero')
+
+        if dtype not in DTYPES:
+            raise ValueError('dtype must be one of ' + ', '.join(DTYPES))
+
+        if (not self.vectorized or self.adaptation or self.min_pop_size or
+                self.polish or self.checkpoint is not None):
+            raise ValueError('cooperative coevolution requires '
+                             'vectorized=True, adaptation=None, '
+                             'min_pop_size=0, polish=0 and checkpoint=None')
+
+        self.group_size = group_size
+        self.group_gen = group_gen
+        self.dtype = dtype
+
+    def find_min(self, func):
+        """
+        Returns tuple consisting of:
+        - function minimum
+        - point where function has a minimum (numpy array of dtype)
+        Sets stop_reason, generations and evaluations.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError
+        """
+        self._check_func(func)
+
+        self._run_de(func)
+        return self._context_cost, self._context.copy()
+
+    def find_min_many(self, funcs):
+        """
+        Not supported, the stacked populations of find_min_many would
+        ignore group_size, group_gen and dtype.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('cooperative coevolution does not support '
+                         'find_min_many')
+
+    def resume(self, func):
+        """
+        Not supported, cooperative coevolution requires checkpoint=None.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('cooperative coevolution does not support resume, '
+                         'it requires checkpoint=None')
+
+    def _run_de(self, func, resume=False):
+        """
+        Implementation of cooperative coevolution.
+        Populates population _x (2d numpy of dtype), context vector
+        _context and its cost _context_cost.
+        """
+        self._start_run()
+        self._checkpointer = None
+
+        # rows are drawn one at a time, no float64 copy of the population
+        lower = np.array(func.lower, dtype=float)
+        upper = np.array(func.upper, dtype=float)
+        self._x = np.empty((self.pop_size, func.dim), dtype=self.dtype)
+        for row in self._x:
+            row[:] = rnd.rand(func.dim)*(upper - lower) + lower
+        start = time.time()
+        self._cost = self._evaluate(func, self._x)
+        self._eval_time += time.time() - start
+
+        best = self._cost.argmin()
+        self._context = self._x[best].copy()
+        self._context_cost = self._cost[best]
+        self._run_generations(func)
+
+    def _run_generations(self, func):
+        """
+        Runs cycles of groups until a stopping criterion is met.
+        """
+        lower = np.array(func.lower, dtype=float)
+        upper = np.array(func.upper, dtype=float)
+        buffer = np.empty_like(self._x)
+
+        while self.stop_reason is None:
+            for group in self._groups(func.dim):
+                self._evolve_group(func, group, lower[group], upper[group],
+                                   buffer)
+                if self.stop_reason is not None:
+                    break
+
+    def _groups(self, dim):
+        """
+        Returns list of groups (sorted 1d numpy arrays of parameter
+        indexes) of a random split of dim parameters into group_size.
+        """
+        order = rnd.permutation(dim)
+        return [np.sort(order[start : start + self.group_size])
+                for start in range(0, dim, self.group_size)]
+
+    def _evolve_group(self, func, group, lower, upper, buffer):
+        """
+        Evaluates the subpopulation of group in the context vector and runs
+        group_gen generations of it, or less if a stopping criterion is
+        met. Sets _cost to costs of the subpopulation.
+        """
+        if self.max_evals and self.evaluations + self.pop_size > \
+                self.max_evals:
+            self.stop_reason = 'max_evals'
+            return
+
+        sub = self._x[:, group]
+        buffer[:] = self._context
+        self._cost = self._evaluate_in_context(func, group, sub, buffer)
+
+        # after regrouping the context vector may not be in the
+        # subpopulation, it replaces the worst point
+        worst = self._cost.argmax()
+        sub[worst] = self._context[group]
+        self._cost[worst] = self._context_cost
+        self._x[:, group] = sub
+
+        for k in range(self.group_gen):
+            if (self.stop_reason is not None or
+                    self._check_stop(self._x, self._cost)):
+                return
+
+            trial = self._group_trial(sub, lower, upper)
+            score = self._evaluate_in_context(func, group, trial, buffer)
+            better = score <= self._cost
+            sub[better] = trial[better]
+            self._cost[better] = score[better]
+            self._x[:, group] = sub
+
+            best = self._cost.argmin()
+            if self._cost[best] < self._context_cost:
+                self._context[group] = sub[best]
+                self._context_cost = self._cost[best]
+            self._end_generation()
+
+    def _group_trial(self, sub, lower, upper):
+        """
+        Returns trials of subpopulation sub (2d numpy), built in place of
+        the mutants, out of bounds elements are replaced with random ones.
+        """
+        n, size = sub.shape
+        trial = self._mutate_stack(sub[np.newaxis], self._cost[np.newaxis],
+                                   self.f)[0].astype(self.dtype, copy=False)
+        cross = self._cross(n, size, self.cr)
+        np.copyto(trial, sub, where=~cross)
+
+        out_row, out_col = np.nonzero((trial < lower) | (trial > upper))
+        if len(out_col):
+            trial[out_row, out_col] = (
+                rnd.rand(len(out_col))*(upper - lower)[out_col] +
+                lower[out_col])
+        return trial
+
+    def _evaluate_in_context(self, func, group, points, buffer):
+        """
+        Returns costs of points (2d numpy) of the group parameters, written
+        to group columns of buffer, which holds the context vector in the
+        other columns.
+        """
+        buffer[:, group] = points
+        start = time.time()
+        cost = self._evaluate(func, buffer)
+        self._eval_time += time.time() - start
+        return cost
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
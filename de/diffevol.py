@@ -1,5 +1,25 @@
+import time
+
 from function import Function
 
+
+# mutation strategies and crossovers
+STRATEGIES = ('rand/1', 'best/1', 'current-to-best/1', 'rand/2', 
+              'current-to-pbest/1')
+CROSSOVERS = ('bin', 'exp')
+
+# local search methods of polishing
+POLISH_METHODS = ('nelder-mead', 'compass')
+
+# self-adaptive control of f and cr
+ADAPTATIONS = ('jde', 'shade')
+
+# names of stopping criteria, in the order they are checked, the last one
+# is set by a generation hook that ends the run
+STOP_REASONS = ('target_cost', 'cost_tol', 'x_tol', 'stagnation',
+                'max_gen', 'max_evals', 'max_time', 'cancelled')
+
+
 class _DifferentialEvolution(object):
     """ 
     Differential Evolution private base class, holds algorithm parameters.
@@ -11,6 +31,106 @@ class _DifferentialEvolution(object):
                 (recomended at least 1000)
     cr       -- crossover constant, float in [0,1]
     f        -- factor of differential amplification, float in [0,2]
+    vectorized -- if True (default) whole generations are built with numpy
+                  array operations, if False the reference per element
+                  loop is used
+    strategy   -- mutation strategy, one of STRATEGIES:
+                  'rand/1'            -- x[c] + f*(x[a] - x[b])
+                  'best/1'            -- best + f*(x[a] - x[b])
+                  'current-to-best/1' -- x[i] + f*(best - x[i]) + 
+                                         f*(x[a] - x[b])
+                  'rand/2'            -- x[e] + f*(x[a] - x[b]) + 
+                                         f*(x[c] - x[d])
+                  'current-to-pbest/1' -- x[i] + f*(pbest - x[i]) +
+                                          f*(x[a] - x[b]), pbest random of
+                                          p_best best fraction
+                  where a, b, c, d, e are random individuals different
+                  from each other and from the target i
+    crossover  -- one of CROSSOVERS: 'bin' (binomial, every parameter
+                  from mutant with probability cr) or 'exp' (exponential,
+                  run of parameters from mutant, each continues the run
+                  with probability cr), one random parameter always comes
+                  from mutant
+    p_best     -- fraction of population pbest is chosen from, float in
+                  (0,1]
+    Strategies other than 'rand/1' with 'bin' crossover require
+    vectorized=True.
+
+    Parameter control, also public members initialized in constructor:
+    adaptation   -- None (default) keeps f and cr constant, otherwise one
+                    of ADAPTATIONS, every individual gets its own f and cr:
+                    'jde'   -- each individual keeps f and cr of its last
+                               successful trial, with probability 0.1
+                               they are replaced by random f in [0.1,1]
+                               and cr in [0,1] before a trial
+                    'shade' -- f and cr are drawn around a random slot of
+                               the success history memory (Cauchy f and
+                               normal cr with scale 0.1), every
+                               generation with improvements writes the
+                               next slot: improvement weighted Lehmer mean
+                               of successful f and weighted mean of
+                               successful cr
+                    f and cr are the initial values of individuals or
+                    memory slots
+    memory_size  -- number of success history slots of 'shade', integer
+                    greater than zero
+    min_pop_size -- if nonzero the population shrinks linearly from
+                    pop_size to min_pop_size over max_evals evaluations,
+                    or max_gen generations without max_evals, worst
+                    individuals are removed
+    Adaptation and min_pop_size require vectorized=True. Adaptation state
+    is checkpointed with the population and continues on resume.
+
+    Polishing, also public members initialized in constructor:
+    polish          -- number of best individuals refined by local
+                       search, 0 (default) disables polishing
+    polish_method   -- one of POLISH_METHODS, points are clipped to
+                       Function bounds, initial steps are half of the
+                       population spread:
+                       'nelder-mead' -- Nelder-Mead simplex search, one
+                                        point evaluated at a time
+                       'compass'     -- compass search, both neighbours
+                                        along each parameter evaluated in
+                                        one batch, suits parallel
+                                        evaluation
+    polish_interval -- generations between polishing, 0 polishes only once
+                       at the end of the run (not of a cancelled run)
+    polish_evals    -- evaluation budget of one search of one individual
+    Polishing evaluations are counted in evaluations, so max_evals
+    limits them too.
+
+    Stopping criteria, also public members initialized in constructor:
+    target_cost -- stop when the best cost is less or equal, None disables
+    cost_tol    -- stop when max - min of population costs is less or equal
+    x_tol       -- stop when population spread (max - min) is less or equal
+                   in every parameter
+    stagnation  -- stop when the best cost did not improve for that many
+                   generations
+    max_evals   -- stop before a generation would exceed that many function
+                   evaluations, at least pop_size since the initial
+                   population is always evaluated
+    max_time    -- stop when run took that many seconds of wall-clock time
+    Zero disables cost_tol, x_tol, stagnation, max_evals and max_time.
+
+    Checkpointing, also public members initialized in constructor:
+    checkpoint          -- directory of the run checkpoint (see Checkpoint),
+                           None disables checkpointing
+    checkpoint_interval -- generations between checkpoint saves, the last
+                           generation is always saved
+
+    Instrumentation, also public members initialized in constructor:
+    observer          -- callable observer(stats) called every
+                         observer_interval generations with dictionary of
+                         run counters (see _run_stats), returning True
+                         ends the run with stop_reason 'cancelled',
+                         None disables it
+    observer_interval -- generations between observer calls
+
+    Public members set by find_min:
+    stop_reason -- name of the criterion that ended the run, one of
+                   STOP_REASONS
+    generations -- number of generations run
+    evaluations -- number of function evaluations
 
     Example:
     >>> def func(x):
@@ -22,9 +142,26 @@ class _DifferentialEvolution(object):
     >>> 
     """
 
-    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5):
+    # keyword arguments shared by all implementations
+    _options = ('vectorized', 'strategy', 'crossover', 'p_best', 
+                'adaptation', 'memory_size', 'min_pop_size', 'polish',
+                'polish_method', 'polish_interval', 'polish_evals',
+                'target_cost', 'cost_tol', 'x_tol', 'stagnation', 'max_evals',
+                'max_time', 'checkpoint', 'checkpoint_interval', 'observer',
+                'observer_interval')
+
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5,
+                 vectorized=True, strategy='rand/1', crossover='bin',
+                 p_best=0.1, adaptation=None, memory_size=10,
+                 min_pop_size=0, polish=0,
+                 polish_method='nelder-mead', polish_interval=0,
+                 polish_evals=1000, target_cost=None, cost_tol=0., x_tol=0.,
+                 stagnation=0, max_evals=0, max_time=0., checkpoint=None,
+                 checkpoint_interval=10, observer=None, observer_interval=1):
         """
-        Initializes public members pop_size, max_gen, cr and f.
+        Initializes public members pop_size, max_gen, cr, f, vectorized,
+        strategy, crossover, p_best, parameter control, polishing, stopping
+        criteria, checkpointing and instrumentation.
 
         Arguments:
         pop_size -- population size, integer constant greater than zero
@@ -33,6 +170,43 @@ class _DifferentialEvolution(object):
                     (recomended at least 1000)
         cr       -- crossover constant, float in [0,1]
         f        -- factor of differential amplification, float in [0,2]
+        vectorized -- if True (default) whole generations are built with
+                      numpy array operations, if False the reference per
+                      element loop is used
+        strategy   -- mutation strategy, one of STRATEGIES
+        crossover  -- crossover, one of CROSSOVERS
+        p_best     -- fraction of population pbest of 'current-to-pbest/1'
+                      is chosen from, float in (0,1]
+        adaptation   -- None or one of ADAPTATIONS
+        memory_size  -- success history slots of 'shade', integer greater
+                        than zero
+        min_pop_size -- final population size of linear reduction,
+                        integer in [4,pop_size] (6 for 'rand/2'), zero
+                        disables the reduction
+        polish          -- number of best individuals polished, integer
+                           >= 0, zero disables polishing
+        polish_method   -- one of POLISH_METHODS
+        polish_interval -- generations between polishing, integer >= 0,
+                           zero polishes only at the end
+        polish_evals    -- evaluations of one search, integer greater than
+                           zero
+        target_cost -- stop when the best cost is less or equal,
+                       None disables
+        cost_tol    -- stop when max - min of population costs is less or
+                       equal, float >= 0
+        x_tol       -- stop when population spread (max - min) is less or
+                       equal in every parameter, float >= 0
+        stagnation  -- stop when the best cost did not improve for that
+                       many generations, integer >= 0
+        max_evals   -- stop before a generation would exceed that many
+                       function evaluations, zero or integer >= pop_size
+        max_time    -- stop when run took that many seconds, float >= 0
+        checkpoint  -- directory of the run checkpoint, None disables it
+        checkpoint_interval -- generations between checkpoint saves,
+                               integer greater than zero
+        observer -- callable observer(stats), None disables it
+        observer_interval -- generations between observer calls, integer
+                             greater than zero
 
         Exceptions:
             ValueError
@@ -50,10 +224,98 @@ class _DifferentialEvolution(object):
         if not (f >= 0 and cr <= 2):
             raise ValueError('f must be float in range [0,2]')
 
+        if strategy not in STRATEGIES:
+            raise ValueError('strategy must be one of ' + 
+                             ', '.join(STRATEGIES))
+
+        if crossover not in CROSSOVERS:
+            raise ValueError('crossover must be one of ' + 
+                             ', '.join(CROSSOVERS))
+
+        if not (p_best > 0 and p_best <= 1):
+            raise ValueError('p_best must be float in range (0,1]')
+
+        if not vectorized and (strategy, crossover) != ('rand/1', 'bin'):
+            raise ValueError('strategy %s with %s crossover requires '
+                             'vectorized=True' % (strategy, crossover))
+
+        if adaptation is not None and adaptation not in ADAPTATIONS:
+            raise ValueError('adaptation must be None or one of ' + 
+                             ', '.join(ADAPTATIONS))
+
+        if not memory_size > 0:
+            raise ValueError('memory_size must be integer greater than zero')
+
+        smallest = 6 if strategy == 'rand/2' else 4
+        if min_pop_size and not (min_pop_size >= smallest and
+                                 min_pop_size <= pop_size):
+            raise ValueError('min_pop_size must be zero or integer in '
+                             'range [%d,pop_size]' % smallest)
+
+        if not vectorized and (adaptation or min_pop_size):
+            raise ValueError('adaptation and min_pop_size require '
+                             'vectorized=True')
+
+        if not (polish >= 0 and polish_interval >= 0):
+            raise ValueError('polish and polish_interval must be integer '
+                             '>= 0')
+
+        if polish_method not in POLISH_METHODS:
+            raise ValueError('polish_method must be one of ' + 
+                             ', '.join(POLISH_METHODS))
+
+        if not polish_evals > 0:
+            raise ValueError('polish_evals must be integer greater than '
+                             'zero')
+
+        if not (cost_tol >= 0 and x_tol >= 0):
+            raise ValueError('cost_tol and x_tol must be float >= 0')
+
+        if not (stagnation >= 0 and max_evals >= 0):
+            raise ValueError('stagnation and max_evals must be integer >= 0')
+
+        if max_evals and max_evals < pop_size:
+            raise ValueError('max_evals must be zero or integer >= pop_size')
+
+        if not max_time >= 0:
+            raise ValueError('max_time must be float >= 0')
+
+        if not checkpoint_interval > 0:
+            raise ValueError('checkpoint_interval must be integer greater '
+                             'than zero')
+
+        if not observer_interval > 0:
+            raise ValueError('observer_interval must be integer greater '
+                             'than zero')
+
         self.pop_size = pop_size
         self.max_gen = max_gen
         self.cr = cr
         self.f = f
+        self.vectorized = vectorized
+        self.strategy = strategy
+        self.crossover = crossover
+        self.p_best = p_best
+        self.adaptation = adaptation
+        self.memory_size = memory_size
+        self.min_pop_size = min_pop_size
+        self.polish = polish
+        self.polish_method = polish_method
+        self.polish_interval = polish_interval
+        self.polish_evals = polish_evals
+        self.target_cost = target_cost
+        self.cost_tol = cost_tol
+        self.x_tol = x_tol
+        self.stagnation = stagnation
+        self.max_evals = max_evals
+        self.max_time = max_time
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.observer = observer
+        self.observer_interval = observer_interval
+
+        # callables hook(de) run after every generation of a process
+        self._generation_hooks = []
 
     def _check_func(self, func):
         """
@@ -68,6 +330,83 @@ class _DifferentialEvolution(object):
         if not isinstance(func, Function):
             raise TypeError('func must be instance of Function')
 
+    def _option_dict(self):
+        """
+        Returns dictionary of keyword arguments (_options) with their
+        current values, used to construct algorithms with same options.
+        """
+        return dict((name, getattr(self, name)) for name in self._options)
+
+    def _start_run(self):
+        """
+        Resets run counters and stopping criteria state.
+        """
+        self.stop_reason = None
+        self.generations = 0
+        self.evaluations = 0
+        self._start_time = time.time()
+        self._best_cost = float('inf')
+        self._stagnant = 0
+        self._eval_time = 0.
+
+    def _run_stats(self):
+        """
+        Returns dictionary of counters of the run and its population:
+        generations   -- number of generations run
+        evaluations   -- number of function evaluations
+        elapsed       -- seconds since the run started
+        eval_time     -- seconds spent evaluating the function
+        overhead      -- elapsed - eval_time, seconds spent by DE itself
+        gen_rate      -- generations per second
+        evals_per_sec -- evaluations per second
+        best_cost     -- best cost of the population
+        mean_cost     -- mean cost of the population
+        diversity     -- mean standard deviation of function parameters
+        """
+        elapsed = max(time.time() - self._start_time, 1e-9)
+        return dict(generations=self.generations,
+                    evaluations=self.evaluations,
+                    elapsed=elapsed,
+                    eval_time=self._eval_time,
+                    overhead=elapsed - self._eval_time,
+                    gen_rate=self.generations/elapsed,
+                    evals_per_sec=self.evaluations/elapsed,
+                    best_cost=float(self._cost.min()),
+                    mean_cost=float(self._cost.mean()),
+                    diversity=float(self._x.std(axis=0).mean()))
+
+    def _check_stop(self, x, cost):
+        """
+        Checks stopping criteria for population x (2d numpy) with costs
+        cost (1d numpy), called once before every generation.
+        Sets stop_reason and returns True if any criterion is met.
+        """
+        best = cost.min()
+        if best < self._best_cost:
+            self._best_cost = best
+            self._stagnant = 0
+        else:
+            self._stagnant += 1
+
+        if self.target_cost is not None and best <= self.target_cost:
+            self.stop_reason = 'target_cost'
+        elif self.cost_tol and cost.max() - best <= self.cost_tol:
+            self.stop_reason = 'cost_tol'
+        elif self.x_tol and (x.max(axis=0) - x.min(axis=0)).max() <= \
+                self.x_tol:
+            self.stop_reason = 'x_tol'
+        elif self.stagnation and self._stagnant >= self.stagnation:
+            self.stop_reason = 'stagnation'
+        elif self.generations >= self.max_gen:
+            self.stop_reason = 'max_gen'
+        elif self.max_evals and self.evaluations + len(x) > self.max_evals:
+            self.stop_reason = 'max_evals'
+        elif self.max_time and time.time() - self._start_time >= \
+                self.max_time:
+            self.stop_reason = 'max_time'
+        return self.stop_reason is not None
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,136 @@
+import multiprocessing as mp
+import numpy as np
+
+from de import DifferentialEvolutionSP
+from worker import DEWorker
+from manager import DEManager
+
+
+class DifferentialEvolutionFarm(DifferentialEvolutionSP):
+    """
+    Differential Evolution algorithm - remote evaluation farm.
+
+    The manager process holds the whole population and runs the vectorized
+    DE algorithm of DifferentialEvolutionSP. Each batch of points
+    (initial population, trials of a generation) is split into tasks of
+    batch_size rows, evaluated by DEWorker processes of the network.
+    All tasks of a batch are queued at once, workers with prefetch greater
+    than one receive the next task while they evaluate the current one.
+    Suited for expensive functions, a single population is evaluated on
+    many nodes.
+
+    Public members initialized in constructor:
+    manager     -- DEManager, its workers evaluate the function
+    func_module -- module of the function, importable by workers and
+                   manager
+    func_name   -- name of the Function instance in func_module
+    pop_size    -- population size, integer constant greater than zero
+    max_gen     -- maximum generations, integer constant greater than zero
+    cr          -- crossover constant, float in [0,1]
+    f           -- factor of differential amplification, float in [0,2]
+    batch_size  -- number of points evaluated by one task, integer greater
+                   than zero
+
+    Keyword arguments mutation (strategy, crossover and p_best), parameter
+    control (adaptation, memory_size and min_pop_size), polishing (polish,
+    polish_method, polish_interval and polish_evals), stopping criteria
+    (target_cost, cost_tol, x_tol, stagnation, max_evals and max_time),
+    checkpointing (checkpoint and checkpoint_interval) and instrumentation
+    (observer and observer_interval) are public members described in
+    _DifferentialEvolution. The reference loop (vectorized=False) can't
+    be used, it evaluates one trial at a time, find_min_many raises
+    ValueError.
+    """
+
+    def __init__(self, manager, func_module, func_name, pop_size=20,
+                 max_gen=1000, cr=0.9, f=0.5, batch_size=1, **kwargs):
+
+        super(DifferentialEvolutionFarm, self).__init__(pop_size, max_gen, cr,
+                                                        f, **kwargs)
+
+        if not self.vectorized:
+            raise ValueError('evaluation farm requires vectorized=True')
+
+        if not batch_size > 0:
+            raise ValueError('batch_size must be integer > 0')
+
+        self.manager = manager
+        self.func_module = func_module
+        self.func_name = func_name
+        self.batch_size = batch_size
+
+    def find_min(self, func=None):
+        """
+        Returns tuple consisting of:
+        - function minimum
+        - point where function has a minimum (numpy array)
+        Sets stop_reason, generations and evaluations.
+
+        Arguments:
+        func -- local instance of the function, None imports func_name
+                from func_module
+
+        Exceptions:
+            TypeError, RuntimeError
+        """
+        return super(DifferentialEvolutionFarm, self).find_min(
+            func or self._import_func())
+
+    def resume(self, func=None):
+        """
+        Continues the run saved in checkpoint, see find_min.
+
+        Exceptions:
+            TypeError, IOError, RuntimeError
+        """
+        return super(DifferentialEvolutionFarm, self).resume(
+            func or self._import_func())
+
+    def find_min_many(self, funcs):
+        """
+        Not supported, find_min_many evaluates every problem in the
+        calling process, workers of the manager would be ignored.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('evaluation farm does not support find_min_many')
+
+    def _import_func(self):
+        module = __import__(self.func_module, fromlist=[self.func_name])
+        return getattr(module, self.func_name)
+
+    def _evaluate(self, func, x):
+        """
+        Returns costs of all rows of x (2d numpy), evaluated by workers.
+
+        Exceptions:
+            RuntimeError
+        """
+        self.evaluations += len(x)
+        work_msg = dict(func_module = self.func_module,
+                        func_name = self.func_name,
+                        evaluate = True)
+        results = self.manager.run_tasks(
+            work_msg, [dict(x = x[start : start + self.batch_size])
+                       for start in range(0, len(x), self.batch_size)])
+        return np.concatenate([arrays['cost'] for arrays in results])
+
+
+
+if __name__ == "__main__":
+    work_count = 4
+
+    work_ports = dict(send='5558', receive='5557', control='5559')
+    work = DEWorker('127.0.0.1', work_ports, prefetch=2)
+    for i in range(work_count):
+        p = mp.Process(target=work.start, args=(i,)).start()
+
+    mgr_ports = dict(send='5557', receive='5558', control='5559')
+    mgr = DEManager(mgr_ports, work_count)
+    de = DifferentialEvolutionFarm(mgr, 'test_function', 'saddle',
+                                   pop_size=40, max_gen=200, cr=0.9, f=0.9,
+                                   batch_size=10)
+    minimum, min_point = de.find_min()
+    print "min f", tuple(min_point), "=", minimum
+    mgr.stop()
@@ -1,68 +1,428 @@
+import collections
 import multiprocessing as mp
-import zmq
+import threading
 import time
+import uuid
 import numpy as np
 
 from de import DifferentialEvolutionSP
 from worker import DEWorker
+from scheduler import Scheduler
 
 
-class DEManager(object):
+class DEFuture(object):
+    """
+    Pending result of a job submitted by DEManager.submit. The future is
+    completed while the manager polls the scheduler, in result() or in
+    the thread started by DEManager.start. Callbacks run in the polling
+    thread.
 
-    def __init__(self, ports, work_count):
-        self.send_port = ports['send']
-        self.receive_port = ports['receive']
-        self.control_port = ports['control']
-        self.work_count = work_count
+    Public members:
+    job  -- job dictionary, see DEManager.iter_jobs
+    best -- tuple (cost, point) of the best individual reported by
+            islands of the job so far, None before the first report
+    """
+
+    def __init__(self, manager, job, tag):
+        self.job = job
+        self.best = None
+        self._manager = manager
+        self._tag = tag
+        self._task = None
+        self._result = None
+        self._error = None
+        self._cancelled = False
+        self._done_callbacks = []
+        self._progress_callbacks = []
+        self._event = threading.Event()
+
+    def done(self):
+        """
+        Returns True if the job finished, failed or was cancelled.
+        """
+        return self._event.is_set()
 
-    def find_min(self, func_module, func_name, de_param):
+    def cancelled(self):
+        """
+        Returns True if the job was cancelled.
+        """
+        return self._cancelled
 
-        self._func_module = func_module
-        self._func_name = func_name
-        self._de_param = de_param
+    def cancel(self):
+        """
+        Cancels the job and stops its islands, returns False if the job is
+        done already.
+        """
+        return self._manager._cancel(self)
 
-        vent_proc = mp.Process(target=self._vent, args=())
-        sink_proc = mp.Process(target=self._sink, args=())
-    
-        vent_proc.start()
-        sink_proc.start()
-        vent_proc.join()
-        sink_proc.join()
+    def result(self, timeout=None):
+        """
+        Waits for the job and returns dictionary with keys minimum,
+        min_point, stop_reason, generations and evaluations.
 
-    def _vent(self):
-        context = zmq.Context()
-        vent_send = context.socket(zmq.PUSH)
-        vent_send.bind('tcp://*:' + self.send_port)
-        time.sleep(1)
+        Arguments:
+        timeout -- seconds to wait, None waits as long as needed
 
-        work_msg = dict(func_module = self._func_module,
-                        func_name = self._func_name,
-                        de_param = self._de_param)
- 
-        for i in range(self.work_count):
-            vent_send.send_json(work_msg)
+        Exceptions:
+            RuntimeError -- job failed, was cancelled or timeout passed
+        """
+        if not self._manager._wait(self.done, timeout):
+            raise RuntimeError('job not done in %g seconds' % timeout)
+        if self._cancelled:
+            raise RuntimeError('job cancelled')
+        if self._error is not None:
+            raise RuntimeError('worker failed:\n' + self._error)
+        return self._result
 
-    def _sink(self):
-        context = zmq.Context()
+    def add_done_callback(self, fn):
+        """
+        Calls fn(future) when the job is done, or now if it's done.
+        """
+        with self._manager._lock:
+            if not self.done():
+                self._done_callbacks.append(fn)
+                return
+        fn(self)
 
-        result_receive = context.socket(zmq.PULL)
-        result_receive.bind('tcp://*:' + self.receive_port)
+    def add_progress_callback(self, fn):
+        """
+        Calls fn(future) every time best improves.
+        """
+        self._progress_callbacks.append(fn)
 
-        control_send = context.socket(zmq.PUB)
-        control_send.bind('tcp://*:' + self.control_port)
+    def _set(self, result=None, error=None, cancelled=False):
+        self._result = result
+        self._error = error
+        self._cancelled = cancelled
+        self._event.set()
+        for fn in self._done_callbacks:
+            fn(self)
+
+
+
+class DEManager(object):
+
+    def __init__(self, ports, work_count, heartbeat_timeout=5.,
+                 task_timeout=None):
+        """
+        Arguments:
+        ports -- dictionary of ports: send (tasks), receive (island
+                 messages) and control (control messages)
+        work_count -- number of optimizations of find_min
+        heartbeat_timeout -- seconds of worker silence before its tasks
+                             are dispatched to other workers
+        task_timeout -- seconds before an unfinished task is dispatched
+                        again, None waits for the worker as long as it's
+                        alive
+        """
+        self.send_port = ports['send']
+        self.receive_port = ports['receive']
+        self.control_port = ports['control']
+        self.work_count = work_count
+        self.scheduler = Scheduler(ports, heartbeat_timeout, task_timeout)
+        self.scheduler.handlers['progress'] = self._progress
+
+        # futures keyed by task id, tags of stopped runs
+        self._futures = {}
+        self._stopped = set()
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def find_min(self, func_module, func_name, de_param, migration=None):
+        """
+        Runs work_count optimizations on workers, prints the best result
+        and returns tuple consisting of:
+        - minimum value
+        - point of the minimum (numpy array)
+        If migration is dictionary with keys interval and migrants,
+        the islands of all workers exchange migrants best individuals every
+        interval generations through the manager. If de_param has
+        target_cost, all optimizations stop once one of them reaches it.
+
+        Exceptions:
+            RuntimeError -- an optimization failed on a worker
+        """
+        job = dict(func_module = func_module,
+                   func_name = func_name,
+                   de_param = de_param,
+                   migration = migration,
+                   tag = uuid.uuid4().hex,
+                   target_cost = de_param.get('target_cost'))
+        futures = [self.submit(job) for i in range(self.work_count)]
 
         min_lst = []
         point_lst = []
-        for i in range(work_count):
-            result_msg = result_receive.recv_json()
-            min_lst.append(result_msg['minimum'])
-            point_lst.append(result_msg['min_point']) 
-        control_send.send("STOP")
+        for future in futures:
+            try:
+                result = future.result()
+            except RuntimeError:
+                if future.cancelled():
+                    continue
+                for other in futures:
+                    other.cancel()
+                raise
+            min_lst.append(result['minimum'])
+            point_lst.append(result['min_point'])
 
         cost = np.array(min_lst)
         x = np.array(point_lst)
         min_index = cost.argmin()
         print "min f", tuple(x[min_index]), "=", cost[min_index]
+        return cost[min_index], x[min_index]
+
+    def submit(self, job):
+        """
+        Queues a job for workers and returns its DEFuture. Islands of the
+        job report their best individual to the future every progress
+        generations. When a report or result of the job reaches
+        target_cost, the manager stops all running jobs with the same tag
+        and cancels the ones not started yet.
+
+        Arguments:
+        job -- dictionary described in iter_jobs
+
+        Exceptions:
+            ValueError -- the job misses a key
+        """
+        self._check_job(job)
+        work_msg = dict((key, job.get(key)) for key in
+                        ('func_module', 'func_name', 'de_param',
+                         'migration', 'seed'))
+        work_msg['tag'] = job.get('tag') or uuid.uuid4().hex
+        work_msg['progress'] = job.get('progress', 10)
+
+        future = DEFuture(self, job, work_msg['tag'])
+        with self._lock:
+            future._task = self.scheduler.submit(work_msg,
+                                                 timeout=job.get('timeout'),
+                                                 callback=self._complete)
+            self._futures[future._task] = future
+        return future
+
+    def run_jobs(self, jobs):
+        """
+        Runs batch of jobs on workers and returns dictionary of results
+        keyed by job id, see iter_jobs.
+        """
+        return dict(self.iter_jobs(jobs))
+
+    def iter_jobs(self, jobs):
+        """
+        Queues batch of jobs for workers and yields tuples (job_id, result)
+        as jobs complete. Workers pull jobs when they have free capacity,
+        so a fleet of workers stays busy until the queue drains. The jobs
+        left are cancelled if the generator is closed before it ends.
+
+        A job is a dictionary with keys:
+        func_module -- module of the function to optimize, on workers
+        func_name   -- name of the function to optimize
+        de_param    -- keyword arguments of DifferentialEvolutionMP
+        migration   -- optional, dictionary with keys interval and migrants
+        tag         -- optional, islands of jobs with the same tag exchange
+                       migrants and stop together, a job without tag gets
+                       its own
+        seed        -- optional, seed of numpy.random for the run
+        timeout     -- optional, seconds before the job is dispatched again
+        target_cost -- optional, cost that stops the jobs with the same tag
+        progress    -- optional, generations between best-so-far reports
+                       of islands (default 10), zero disables them
+
+        A result is a dictionary with keys minimum, min_point, stop_reason,
+        generations and evaluations, or a dictionary with key error holding
+        the traceback of a job failed on its worker, or 'job cancelled'.
+
+        Arguments:
+        jobs -- dictionary of jobs keyed by job id, or sequence of jobs
+                with their indexes as ids
+
+        Exceptions:
+            ValueError -- a job misses a key
+        """
+        if not isinstance(jobs, dict):
+            jobs = dict(enumerate(jobs))
+        for job_id, job in jobs.items():
+            self._check_job(job, job_id)
+
+        done = collections.deque()
+        job_ids = {}
+        for job_id, job in jobs.items():
+            future = self.submit(job)
+            job_ids[future] = job_id
+            future.add_done_callback(done.append)
+
+        try:
+            for i in range(len(job_ids)):
+                self._wait(lambda: done)
+                future = done.popleft()
+                if future.cancelled():
+                    yield job_ids[future], dict(error = 'job cancelled')
+                elif future._error is not None:
+                    yield job_ids[future], dict(error = future._error)
+                else:
+                    yield job_ids[future], future._result
+        finally:
+            for future in job_ids:
+                future.cancel()
+
+    def run_tasks(self, work_msg, arrays_lst):
+        """
+        Runs one task of work_msg per dictionary of numpy arrays of
+        arrays_lst on workers and returns list of dictionaries of result
+        arrays in the same order. All tasks are queued at once, the ones
+        left are cancelled when a task fails.
+
+        Arguments:
+        work_msg   -- JSON serializable dictionary of the work, handled by
+                      DEWorker
+        arrays_lst -- sequence of dictionaries of numpy arrays
+
+        Exceptions:
+            RuntimeError -- a task failed on a worker
+        """
+        results = [None]*len(arrays_lst)
+        indexes = {}
+        errors = []
+        def collect(task_id, result_msg, arrays):
+            i = indexes.pop(task_id)
+            if result_msg['type'] == 'error':
+                errors.append(result_msg['traceback'])
+            else:
+                results[i] = arrays
+
+        with self._lock:
+            for i, arrays in enumerate(arrays_lst):
+                task_id = self.scheduler.submit(work_msg, arrays,
+                                                callback=collect)
+                indexes[task_id] = i
+
+        try:
+            self._wait(lambda: errors or not indexes)
+        finally:
+            with self._lock:
+                self.scheduler.cancel(indexes.keys())
+        if errors:
+            raise RuntimeError('worker failed:\n' + errors[0])
+        return results
+
+    def poll(self, timeout=None):
+        """
+        Handles messages of workers and completes futures, returns True
+        after a result arrives, or False after timeout seconds pass.
+        Not needed after start.
+        """
+        with self._lock:
+            return self.scheduler.poll(timeout)
+
+    def start(self):
+        """
+        Starts a thread that polls the scheduler, futures complete and
+        their callbacks run in it without calls to poll or result.
+        """
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._serve)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the polling thread and all workers, closes the manager
+        sockets.
+        """
+        if self._thread is not None:
+            self._running = False
+            self._thread.join()
+            self._thread = None
+        self.scheduler.stop_workers()
+        time.sleep(0.1)
+        self.scheduler.close()
+
+    def _serve(self):
+        while self._running:
+            self.poll(0.1)
+
+    def _wait(self, ready, timeout=None):
+        """
+        Polls, or waits for the polling thread, until ready() returns True
+        or timeout seconds pass. Returns the last ready() value.
+        """
+        start = time.time()
+        while not ready():
+            wait = 0.1
+            if timeout is not None:
+                wait = min(wait, start + timeout - time.time())
+                if wait <= 0:
+                    return False
+            if self._thread is None:
+                self.poll(wait)
+            else:
+                time.sleep(min(wait, 0.01))
+        return True
+
+    def _check_job(self, job, job_id=None):
+        for key in ('func_module', 'func_name', 'de_param'):
+            if key not in job:
+                raise ValueError('job %r has no %s' % (job_id, key))
+
+    def _cancel(self, future):
+        with self._lock:
+            if future.done():
+                return False
+            del self._futures[future._task]
+            self.scheduler.cancel([future._task])
+            self.scheduler.publish('CANCEL %d' % future._task)
+            future._set(cancelled=True)
+            return True
+
+    def _complete(self, task_id, msg, arrays):
+        """
+        Scheduler callback, completes the future of task_id.
+        """
+        future = self._futures.pop(task_id, None)
+        if future is None:
+            return
+        if msg['type'] == 'error':
+            future._set(error=msg['traceback'])
+            return
+        if msg['type'] == 'cancelled':
+            # skipped by the worker, its tag was stopped
+            future._set(cancelled=True)
+            return
+
+        result = dict((key, msg[key]) for key in
+                      ('minimum', 'stop_reason', 'generations',
+                       'evaluations'))
+        result['min_point'] = np.array(arrays['min_point'])
+        self._check_target(future, result['minimum'])
+        future._set(result=result)
+
+    def _progress(self, msg, arrays):
+        """
+        Scheduler handler of progress messages of islands.
+        """
+        future = self._futures.get(msg['task'])
+        if future is None:
+            return
+        if future.best is None or msg['cost'] < future.best[0]:
+            future.best = (msg['cost'], np.array(arrays['x']))
+            for fn in future._progress_callbacks:
+                fn(future)
+            self._check_target(future, msg['cost'])
+
+    def _check_target(self, future, cost):
+        """
+        Stops all jobs with the tag of future, if cost reaches its target.
+        """
+        target_cost = future.job.get('target_cost')
+        if target_cost is None or cost > target_cost or \
+                future._tag in self._stopped:
+            return
+        self._stopped.add(future._tag)
+        self.scheduler.publish('CANCEL ' + future._tag)
+        for other in self._futures.values():
+            if other._tag == future._tag and \
+                    self.scheduler.is_pending(other._task):
+                self._cancel(other)
 
 
 
@@ -77,4 +437,29 @@ if __name__ == "__main__":
     mgr_ports = dict(send='5557', receive='5558', control='5559')
     mgr = DEManager(mgr_ports, 4)
     de_param = dict(pop_size=40, max_gen=1000, cr=0.9, f=0.9, proc_count=2)
-    mgr.find_min('test_function','saddle',de_param)
+    mgr.find_min('test_function','saddle',de_param, 
+                 migration=dict(interval=20, migrants=2))
+
+    # parameter sweep, results stream in as jobs complete
+    jobs = dict(((f, seed), dict(func_module='test_function',
+                                 func_name='saddle', seed=seed,
+                                 de_param=dict(pop_size=20, max_gen=200,
+                                               cr=0.9, f=f)))
+                for f in (0.5, 0.7, 0.9) for seed in range(3))
+    for job_id, result in mgr.iter_jobs(jobs):
+        print "job", job_id, result.get('minimum'), result.get('stop_reason')
+
+    # futures, the cluster stops once one job reaches the target
+    mgr.start()
+    job = dict(func_module='test_function', func_name='saddle',
+               tag='target', target_cost=1e-6, progress=5,
+               de_param=dict(pop_size=40, max_gen=5000, proc_count=2))
+    futures = [mgr.submit(job) for i in range(work_count)]
+    def report(future):
+        print "best", future.best[0]
+    futures[0].add_progress_callback(report)
+    for future in futures:
+        result = future.result()
+        print "future", result['minimum'], result['stop_reason'], \
+            result['generations']
+    mgr.stop()
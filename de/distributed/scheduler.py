@@ -0,0 +1,258 @@
+import collections
+import itertools
+import time
+import zmq
+
+from transport import send_msg, decode_msg
+
+
+class Scheduler(object):
+    """
+    Fault-tolerant pull-based task scheduler of DEManager.
+
+    Workers connect DEALER sockets to the scheduler ROUTER socket and
+    register with a ready message that grants credit, the number of tasks
+    they accept at once. A task is sent only to a worker with credit, and
+    a result returns one credit, so idle workers pull work. Workers send
+    heartbeats, a worker silent for heartbeat_timeout seconds is dropped
+    and its tasks are dispatched again. A dropped worker that turns out to
+    be alive gets its unused credit back. A task not finished within its
+    timeout is dispatched again too, the first result of a task wins.
+
+    Messages (transport.send_msg) from a worker:
+    ready     -- msg with credit, registers the worker
+    heartbeat -- worker is alive
+    result    -- msg with task and result values, arrays of the result
+    error     -- msg with task and traceback of a failed task
+    cancelled -- msg with task skipped by the worker after CANCEL
+
+    The PULL socket receives messages of island processes, migrants are
+    published to all workers on control PUB socket under MIGRANTS topic,
+    other messages are passed to handlers.
+
+    Public members:
+    handlers -- dictionary of callables handler(msg, arrays) keyed by
+                type of island messages
+    """
+
+    def __init__(self, ports, heartbeat_timeout=5., task_timeout=None):
+        """
+        Arguments:
+        ports -- dictionary of manager ports: send (ROUTER), receive (PULL)
+                 and control (PUB)
+        heartbeat_timeout -- seconds of worker silence before it's dropped
+        task_timeout -- default seconds before a task is dispatched again,
+                        None waits for the worker as long as it's alive
+        """
+        self.heartbeat_timeout = heartbeat_timeout
+        self.task_timeout = task_timeout
+
+        self._context = zmq.Context()
+        self._work = self._context.socket(zmq.ROUTER)
+        self._work.bind('tcp://*:' + ports['send'])
+        self._receive = self._context.socket(zmq.PULL)
+        self._receive.bind('tcp://*:' + ports['receive'])
+        self._control = self._context.socket(zmq.PUB)
+        self._control.bind('tcp://*:' + ports['control'])
+
+        self._poller = zmq.Poller()
+        self._poller.register(self._work, zmq.POLLIN)
+        self._poller.register(self._receive, zmq.POLLIN)
+
+        self.handlers = {}
+        self._ids = itertools.count()
+        self._workers = {}
+        self._dropped = {}
+        self._ready = collections.deque()
+        self._tasks = {}
+        self._pending = collections.deque()
+        self._done = collections.deque()
+
+    def submit(self, msg, arrays=None, timeout=None, callback=None):
+        """
+        Queues a task and returns its id.
+
+        Arguments:
+        msg      -- JSON serializable dictionary sent to a worker
+        arrays   -- dictionary of numpy arrays sent with msg
+        timeout  -- seconds before the task is dispatched again,
+                    None uses task_timeout
+        callback -- callable callback(task_id, msg, arrays) called with the
+                    result instead of yielding it from results
+        """
+        task_id = next(self._ids)
+        if timeout is None:
+            timeout = self.task_timeout
+        self._tasks[task_id] = dict(msg=msg, arrays=arrays, timeout=timeout,
+                                    worker=None, deadline=None,
+                                    callback=callback)
+        self._pending.append(task_id)
+        return task_id
+
+    def cancel(self, task_ids):
+        """
+        Forgets tasks, their results are ignored.
+        """
+        for task_id in task_ids:
+            task = self._tasks.pop(task_id, None)
+            if task is not None and task['worker'] in self._workers:
+                self._workers[task['worker']]['tasks'].discard(task_id)
+        self._pending = collections.deque(task_id for task_id in self._pending
+                                          if task_id in self._tasks)
+
+    def outstanding(self):
+        """
+        Returns number of submitted tasks without a result.
+        """
+        return len(self._tasks)
+
+    def is_pending(self, task_id):
+        """
+        Returns True if the task waits in the queue for a worker.
+        """
+        return task_id in self._pending
+
+    def results(self, timeout=None):
+        """
+        Dispatches tasks and yields (task_id, msg, arrays) of results as
+        they arrive, until there are no outstanding tasks without callback.
+        A failed task yields msg with type error.
+
+        Arguments:
+        timeout -- seconds to wait for the next result before the
+                   generator stops, None waits as long as needed
+        """
+        while self._done or any(task['callback'] is None
+                                for task in self._tasks.values()):
+            if not self._done and not self.poll(timeout):
+                return
+            if self._done:
+                yield self._done.popleft()
+
+    def poll(self, timeout=None):
+        """
+        Handles worker messages, dispatches tasks and checks timeouts,
+        returns True after a result arrives, or False after timeout
+        seconds pass.
+        """
+        start = time.time()
+        while True:
+            self._dispatch()
+            wait = self.heartbeat_timeout/5.
+            if timeout is not None:
+                wait = min(wait, start + timeout - time.time())
+                if wait < 0:
+                    return False
+            socks = dict(self._poller.poll(wait*1000))
+
+            delivered = False
+            if socks.get(self._work) == zmq.POLLIN:
+                frames = self._work.recv_multipart(copy=False)
+                delivered = self._handle(frames[0].bytes,
+                                         *decode_msg(frames[1:]))
+
+            if socks.get(self._receive) == zmq.POLLIN:
+                frames = self._receive.recv_multipart(copy=False)
+                msg, arrays = decode_msg(frames)
+                self._relay(msg, arrays, frames)
+
+            self._check_timeouts()
+            if delivered:
+                return True
+
+    def stop_workers(self):
+        """
+        Publishes STOP to all workers.
+        """
+        self.publish("STOP")
+
+    def publish(self, message):
+        """
+        Publishes message string to all workers and islands on control
+        socket, the first word is the topic.
+        """
+        self._control.send(message)
+
+    def close(self):
+        """
+        Closes sockets.
+        """
+        self._context.destroy(linger=0)
+
+    def _handle(self, worker, msg, arrays):
+        if worker not in self._workers:
+            self._workers[worker] = dict(tasks=set(), seen=time.time())
+            # a dropped worker is alive after all, tasks it still holds
+            # return their credit with their results
+            self._ready.extend([worker]*self._dropped.pop(worker, 0))
+        state = self._workers[worker]
+        state['seen'] = time.time()
+
+        if msg['type'] == 'ready':
+            self._ready.extend([worker]*msg['credit'])
+        elif msg['type'] in ('result', 'error', 'cancelled'):
+            self._ready.append(worker)
+            task_id = msg['task']
+            state['tasks'].discard(task_id)
+            if task_id in self._tasks:
+                # first result wins, other copies are ignored
+                task = self._tasks.pop(task_id)
+                if task['worker'] != worker and \
+                        task['worker'] in self._workers:
+                    self._workers[task['worker']]['tasks'].discard(task_id)
+                if task_id in self._pending:
+                    self._pending.remove(task_id)
+                if task['callback'] is None:
+                    self._done.append((task_id, msg, arrays))
+                else:
+                    task['callback'](task_id, msg, arrays)
+                return True
+        return False
+
+    def _relay(self, msg, arrays, frames):
+        if msg['type'] == 'migrants':
+            self._control.send_multipart(["MIGRANTS"] + frames, copy=False)
+        elif msg['type'] in self.handlers:
+            self.handlers[msg['type']](msg, arrays)
+
+    def _dispatch(self):
+        while self._pending and self._ready:
+            worker = self._ready.popleft()
+            if worker not in self._workers:
+                continue
+
+            task_id = self._pending.popleft()
+            task = self._tasks[task_id]
+            task['worker'] = worker
+            if task['timeout'] is not None:
+                task['deadline'] = time.time() + task['timeout']
+            self._workers[worker]['tasks'].add(task_id)
+
+            msg = dict(type='task', task=task_id, work=task['msg'])
+            self._work.send(worker, zmq.SNDMORE)
+            send_msg(self._work, msg, task['arrays'])
+
+    def _check_timeouts(self):
+        now = time.time()
+        for worker, state in list(self._workers.items()):
+            if now - state['seen'] > self.heartbeat_timeout:
+                # lost worker, its tasks go back to the queue and its
+                # unused credit is kept in case it comes back
+                del self._workers[worker]
+                self._dropped[worker] = self._ready.count(worker)
+                self._ready = collections.deque(
+                    ready for ready in self._ready if ready != worker)
+                for task_id in state['tasks']:
+                    self._requeue(task_id)
+
+        for task_id, task in self._tasks.items():
+            if task['deadline'] is not None and now > task['deadline']:
+                self._requeue(task_id)
+
+    def _requeue(self, task_id):
+        task = self._tasks.get(task_id)
+        if task is None or task_id in self._pending:
+            return
+        task['worker'] = None
+        task['deadline'] = None
+        self._pending.appendleft(task_id)
@@ -0,0 +1,71 @@
+import json
+import numpy as np
+import zmq
+
+
+def send_msg(socket, msg, arrays=None, flags=0):
+    """
+    Sends message dictionary msg and dictionary of numpy arrays as one
+    multipart message. The first frame is a JSON header with msg and
+    name, dtype and shape of every array. Every array follows in its own
+    frame as a raw buffer, sent without copying.
+
+    Arguments:
+    socket -- zmq socket
+    msg    -- JSON serializable dictionary
+    arrays -- dictionary of numpy arrays, None sends no arrays
+    flags  -- zmq send flags
+    """
+    arrays = [(name, np.asarray(a))
+              for name, a in sorted((arrays or {}).items())]
+    header = dict(msg=msg, arrays=[(name, a.dtype.str, a.shape)
+                                   for name, a in arrays])
+
+    more = zmq.SNDMORE if arrays else 0
+    socket.send(json.dumps(header), flags | more)
+    for i, (name, a) in enumerate(arrays):
+        # non-contiguous arrays are copied, the header keeps the shape of
+        # 0-d arrays that ascontiguousarray makes 1-d
+        more = zmq.SNDMORE if i < len(arrays) - 1 else 0
+        socket.send(np.ascontiguousarray(a), flags | more, copy=False)
+
+
+def recv_msg(socket, flags=0):
+    """
+    Receives message sent by send_msg and returns tuple consisting of:
+    - message dictionary
+    - dictionary of numpy arrays, read-only views of received frames
+
+    Arguments:
+    socket -- zmq socket
+    flags  -- zmq recv flags
+    """
+    frames = socket.recv_multipart(flags, copy=False)
+    return decode_msg(frames)
+
+
+def decode_msg(frames):
+    """
+    Returns message dictionary and dictionary of numpy arrays of received
+    frames of send_msg message, arrays don't copy frame buffers.
+
+    Arguments:
+    frames -- list of zmq frames
+    """
+    header = json.loads(frames[0].bytes)
+    arrays = dict((name, np.frombuffer(frame, dtype).reshape(shape))
+                  for frame, (name, dtype, shape)
+                  in zip(frames[1:], header['arrays']))
+    return header['msg'], arrays
+
+
+if __name__ == "__main__":
+    context = zmq.Context()
+    receiver = context.socket(zmq.PAIR)
+    port = receiver.bind_to_random_port('tcp://127.0.0.1')
+    sender = context.socket(zmq.PAIR)
+    sender.connect('tcp://127.0.0.1:%d' % port)
+
+    send_msg(sender, dict(minimum=0.5), dict(min_point=np.arange(6.)))
+    msg, arrays = recv_msg(receiver)
+    print msg, arrays
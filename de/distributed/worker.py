@@ -1,59 +1,339 @@
+import multiprocessing as mp
+import os
+import Queue
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
 import zmq
-from de import DifferentialEvolutionMP
+import numpy as np
+import numpy.random as rnd
+
+from de import DifferentialEvolutionMP, DifferentialEvolutionPool
+from transport import send_msg, recv_msg, decode_msg
 
 class DEWorker(object):
-    
-    def __init__(self, manager_ip, ports):
+
+    def __init__(self, manager_ip, ports, prefetch=1, heartbeat_interval=1.):
         self.receive_addr = 'tcp://' + manager_ip + ':' + ports['receive']
         self.send_addr = 'tcp://' + manager_ip + ':' + ports['send']
         self.control_addr = 'tcp://' + manager_ip + ':' + ports['control']
-         
+        # tasks requested ahead and seconds between heartbeats
+        self.prefetch = prefetch
+        self.heartbeat_interval = heartbeat_interval
+        # resolved functions keyed by (module, name) and the process pool,
+        # both kept across tasks
+        self._funcs = {}
+        self._pool = None
+
     def start(self, i):
+        # workers forked from one process must not repeat the same run
+        rnd.seed()
+
+        # a process with zmq sockets and threads must not fork, so DE runs
+        # and their pool processes are forked by a compute process started
+        # before the zmq context
+        runs, compute_runs = mp.Pipe()
+        compute = mp.Process(target=self._compute, args=(compute_runs, runs))
+        compute.start()
+        compute_runs.close()
         context = zmq.Context()
- 
-        work_receive = context.socket(zmq.PULL)
-        work_receive.connect(self.receive_addr)
 
-        result_send = context.socket(zmq.PUSH)
-        result_send.connect(self.send_addr)
+        # tasks are requested from the manager scheduler
+        work_socket = context.socket(zmq.DEALER)
+        work_socket.connect(self.receive_addr)
 
         # Set up a channel to receive control messages over
         control_receive = context.socket(zmq.SUB)
         control_receive.connect(self.control_addr)
-        control_receive.setsockopt(zmq.SUBSCRIBE, "")
+        control_receive.setsockopt(zmq.SUBSCRIBE, "STOP")
+        control_receive.setsockopt(zmq.SUBSCRIBE, "CANCEL")
+
+        # tags of tasks waiting in the local queue keyed by task id, ids
+        # of the ones cancelled before they start
+        self._queued = {}
+        self._cancelled = set()
+        self._lock = threading.Lock()
 
-        # Set up a poller to multiplex the work receiver and control receiver
+        # tasks run in a thread, heartbeats go on during long tasks,
+        # results come back over an inproc socket to wake up the poller
+        result_receive = context.socket(zmq.PULL)
+        result_receive.bind('inproc://results')
+        tasks = Queue.Queue()
+        thread = threading.Thread(target=self._work,
+                                  args=(i, tasks, context, runs))
+        thread.daemon = True
+        thread.start()
+
+        # Set up a poller to multiplex the work receiver, result receiver
+        # and control receiver
         poller = zmq.Poller()
-        poller.register(work_receive, zmq.POLLIN)
+        poller.register(work_socket, zmq.POLLIN)
+        poller.register(result_receive, zmq.POLLIN)
         poller.register(control_receive, zmq.POLLIN)
-     
+
+        send_msg(work_socket, dict(type = 'ready', credit = self.prefetch))
+        beat = time.time()
+
         # Loop and accept messages from both channels
         while True:
-            socks = dict(poller.poll())
+            socks = dict(poller.poll(100))
 
-            if socks.get(work_receive) == zmq.POLLIN:
-                print "Working:", i
+            if socks.get(work_socket) == zmq.POLLIN:
+                task_msg, arrays = recv_msg(work_socket)
+                with self._lock:
+                    self._queued[task_msg['task']] = \
+                        task_msg['work'].get('tag')
+                tasks.put((task_msg, arrays))
+
+            if socks.get(result_receive) == zmq.POLLIN:
+                frames = result_receive.recv_multipart(copy=False)
+                work_socket.send_multipart(frames, copy=False)
+                beat = time.time()
 
-                work_msg = work_receive.recv_json()
-                module = __import__(work_msg['func_module'], 
-                                    work_msg['func_name'])
-                func = getattr(module, work_msg['func_name'])
-                de_param = work_msg['de_param']
-
-                algo = DifferentialEvolutionMP(de_param['pop_size'], 
-                                               de_param['max_gen'],
-                                               de_param['cr'], 
-                                               de_param['f'],
-                                               de_param['proc_count'])
-     
-                minimum, min_point = algo.find_min(func)
-                result_msg = dict(minimum = minimum, 
-                                  min_point = tuple(min_point))
-                result_send.send_json(result_msg)
+            if time.time() - beat >= self.heartbeat_interval:
+                send_msg(work_socket, dict(type = 'heartbeat'))
+                beat = time.time()
 
             if socks.get(control_receive) == zmq.POLLIN:
                 control_message = control_receive.recv()
                 if control_message == "STOP":
                     print "Worker", i, "stopped"
                     break
+                self._cancel(control_message.split()[1:])
+
+        # a run in progress is cut short, pool processes end with the
+        # compute process
+        compute.terminate()
+        compute.join()
+
+    def _work(self, i, tasks, context, runs):
+        result_send = context.socket(zmq.PUSH)
+        result_send.connect('inproc://results')
+        while True:
+            task_msg, arrays = tasks.get()
+            with self._lock:
+                del self._queued[task_msg['task']]
+                skip = task_msg['task'] in self._cancelled
+                self._cancelled.discard(task_msg['task'])
+            if skip:
+                send_msg(result_send, dict(type = 'cancelled',
+                                           task = task_msg['task']))
+                continue
+
+            work_msg = task_msg['work']
+            if work_msg.get('evaluate'):
+                # evaluation farm task, costs of the rows of x
+                try:
+                    func = self._resolve(work_msg['func_module'],
+                                         work_msg['func_name'])
+                    result_msg = dict()
+                    result_arrays = dict(cost = func.batch(arrays['x']))
+                    error = None
+                except Exception:
+                    error = traceback.format_exc()
+            else:
+                print "Working:", i
+                try:
+                    runs.send((work_msg, task_msg['task']))
+                    result_msg, result_arrays, error = runs.recv()
+                except (EOFError, IOError):
+                    # the compute process ended at STOP
+                    return
+
+            if error is None:
+                result_msg.update(type = 'result', task = task_msg['task'])
+            else:
+                result_msg = dict(type = 'error', task = task_msg['task'],
+                                  traceback = error)
+                result_arrays = None
+            send_msg(result_send, result_msg, result_arrays)
+
+    def _cancel(self, ids):
+        """
+        Marks queued tasks cancelled, the ones with id or tag in ids.
+        A run in progress is stopped by its _RemoteProgress hook.
+        """
+        with self._lock:
+            for task_id, tag in self._queued.items():
+                if str(task_id) in ids or tag in ids:
+                    self._cancelled.add(task_id)
+
+    def _compute(self, runs, worker_runs):
+        """
+        Compute process loop, runs DE of (work_msg, task_id) received from
+        runs pipe until it's terminated or the worker end closes. Sends back
+        (result_msg, result_arrays, None), or (None, None, traceback
+        string) on error.
+        """
+        worker_runs.close()
+        # SIGTERM exits normally, so daemonic pool processes are stopped
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+        while True:
+            try:
+                run = runs.recv()
+            except EOFError:
+                break
+
+            try:
+                result_msg, result_arrays = self._run_task(*run)
+                runs.send((result_msg, result_arrays, None))
+            except Exception:
+                runs.send((None, None, traceback.format_exc()))
+
+    def _run_task(self, work_msg, task_id):
+        func = self._resolve(work_msg['func_module'], work_msg['func_name'])
+        if work_msg.get('seed') is not None:
+            rnd.seed(work_msg['seed'])
+
+        algo = self._get_pool(work_msg['de_param'])
+        tag = work_msg.get('tag')
+        algo._generation_hooks = [
+            _RemoteProgress(self.send_addr, self.control_addr, task_id, tag,
+                            work_msg.get('progress') or 0)]
+        migration = work_msg.get('migration')
+        if migration:
+            algo._generation_hooks.append(
+                _RemoteMigration(self.send_addr, self.control_addr,
+                                 migration['interval'],
+                                 migration['migrants'], tag))
+
+        minimum, min_point = algo.find_min(func)
+        result_msg = dict(minimum = minimum,
+                          stop_reason = algo.stop_reason,
+                          generations = algo.generations,
+                          evaluations = algo.evaluations)
+        return result_msg, dict(min_point = min_point)
+
+    def _resolve(self, func_module, func_name):
+        """
+        Returns function func_name of module func_module, imported by the
+        first task that needs it.
+        """
+        key = (func_module, func_name)
+        if key not in self._funcs:
+            module = __import__(func_module, fromlist=[func_name])
+            self._funcs[key] = getattr(module, func_name)
+        return self._funcs[key]
+
+    def _get_pool(self, de_param):
+        """
+        Returns DifferentialEvolutionPool set up with de_param. The pool
+        processes of the previous task are reused unless pop_size,
+        proc_count or migrants changed. Pool processes are daemons, they
+        end with the compute process.
+        """
+        # fresh instance validates de_param and supplies defaults
+        params = DifferentialEvolutionMP(**de_param)
+        if self._pool is None:
+            self._pool = DifferentialEvolutionPool(**de_param)
+        vars(self._pool).update((name, value) for name, value
+                                in vars(params).items()
+                                if not name.startswith('_'))
+        return self._pool
+
+
+
+def _island_socket(address, socket_type, topic=None):
+    """
+    Returns zmq socket of the island process connected to address, created
+    by the first call and kept for the following runs of the process.
+    """
+    key = (os.getpid(), address, socket_type, topic)
+    if key not in _island_sockets:
+        sock = zmq.Context.instance().socket(socket_type)
+        sock.connect(address)
+        if topic is not None:
+            sock.setsockopt(zmq.SUBSCRIBE, topic)
+        _island_sockets[key] = sock
+    return _island_sockets[key]
+
+_island_sockets = {}
+
+
+
+class _RemoteProgress(object):
+    """
+    Generation hook of an island process, reports the best individual to
+    the manager every interval generations (zero disables reports) and
+    ends the run when the manager publishes CANCEL with the task id or
+    the tag of the run.
+    """
+
+    def __init__(self, send_addr, control_addr, task, tag, interval):
+        self.send_addr = send_addr
+        self.control_addr = control_addr
+        self.task = task
+        self.tag = tag
+        self.interval = interval
+
+    def __call__(self, de):
+        receive = _island_socket(self.control_addr, zmq.SUB, "CANCEL")
+        while receive.poll(0):
+            ids = receive.recv().split()[1:]
+            if self.tag in ids or str(self.task) in ids:
+                de.stop_reason = 'cancelled'
+
+        if self.interval and de.generations % self.interval == 0:
+            best = de._cost.argmin()
+            send_msg(_island_socket(self.send_addr, zmq.PUSH),
+                     dict(type = 'progress', task = self.task,
+                          cost = de._cost[best],
+                          generations = de.generations),
+                     dict(x = de._x[best]))
+
+
+
+class _RemoteMigration(object):
+    """
+    Generation hook of an island process, exchanges individuals with
+    islands of other workers through the manager. Every interval
+    generations the island pushes its best individuals to the manager,
+    which publishes them to all islands on the control channel. The
+    island replaces its worst individuals with better migrants received
+    since the last migration. Only migrants with the same tag are
+    accepted, so concurrent runs don't mix.
+    """
+
+    def __init__(self, send_addr, control_addr, interval, migrants,
+                 tag=None):
+        self.send_addr = send_addr
+        self.control_addr = control_addr
+        self.interval = interval
+        self.count = migrants
+        self.tag = tag
+
+    def __call__(self, de):
+        if de.generations % self.interval:
+            return
+
+        send = _island_socket(self.send_addr, zmq.PUSH)
+        receive = _island_socket(self.control_addr, zmq.SUB, "MIGRANTS")
+        source = '%s-%d' % (socket.gethostname(), os.getpid())
+
+        count = min(self.count, len(de._cost) - 1)
+        best = np.argsort(de._cost)[:count]
+        send_msg(send, dict(type = 'migrants', source = source,
+                            tag = self.tag),
+                 dict(x = de._x[best], cost = de._cost[best]))
+
+        x_lst = []
+        cost_lst = []
+        while receive.poll(0):
+            frames = receive.recv_multipart(copy=False)
+            msg, arrays = decode_msg(frames[1:])
+            if msg['source'] != source and msg['tag'] == self.tag:
+                x_lst.append(arrays['x'])
+                cost_lst.append(arrays['cost'])
+        if not cost_lst:
+            return
 
+        cost = np.concatenate(cost_lst)
+        x = np.concatenate(x_lst)
+        order = np.argsort(cost)[:count]
+        targets = np.argsort(de._cost)[::-1][:len(order)]
+        accept = cost[order] < de._cost[targets]
+        de._x[targets[accept]] = x[order][accept]
+        de._cost[targets[accept]] = cost[order][accept]
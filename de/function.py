@@ -1,3 +1,4 @@
+import collections
 import numpy as np
 
 
@@ -13,6 +14,19 @@ class Function(object):
              numerical sequence of length dim
     upper -- upper bounds for function parameters
              numerical sequence of length dim
+    vectorized -- if True func(x) takes 2d numpy array x of shape (n, dim)
+                  and returns numerical sequence of n function values
+    cache_size -- maximum number of func values kept in the least recently
+                  used cache, zero disables the cache
+    cache_quantum -- points are rounded to multiples of cache_quantum to
+                     make cache keys, so all points of a cell share one
+                     value, zero uses exact points
+
+    Public members counting cache use:
+    cache_hits   -- number of values found in the cache
+    cache_misses -- number of values computed by func
+
+    Every process has its own cache.
 
     Function func(x) must be continuous for all:
             lower[i] <= x[i] < upper[i] where i in [0, dim)
@@ -22,11 +36,29 @@ class Function(object):
     ...     return x[0]**2 + x[1]**2
     ...
     >>> sphere = Function(func, 2, (-10,-10), (10,10))
+    >>> 
+    >>> def vfunc(x):
+    ...     return (x**2).sum(axis=1)
+    ...
+    >>> vsphere = Function(vfunc, 2, (-10,-10), (10,10), vectorized=True)
+    >>> vsphere.batch([[1, 2], [3, 4]])
+    array([ 5., 25.])
+    >>> vsphere((1, 2))
+    5.0
+    >>> 
+    >>> csphere = Function(func, 2, (-10,-10), (10,10), cache_size=100,
+    ...                    cache_quantum=0.1)
+    >>> csphere.batch([[1, 2], [1.01, 2], [1, 2]])
+    array([5., 5., 5.])
+    >>> csphere.cache_hits, csphere.cache_misses
+    (2, 1)
     """
 
-    def __init__(self, func, dim, lower, upper):
+    def __init__(self, func, dim, lower, upper, vectorized=False,
+                 cache_size=0, cache_quantum=0.):
         """
-        Initializes public member func, dim, lower and upper
+        Initializes public member func, dim, lower, upper, vectorized and
+        cache parameters
 
         Arguments:
         func  -- function to be minimized func(x)
@@ -36,6 +68,13 @@ class Function(object):
                  numerical sequence of length dim
         upper -- upper bounds for function parameters
                  numerical sequence of length dim
+        vectorized -- if True func(x) takes 2d numpy array x of shape 
+                      (n, dim) and returns numerical sequence of n function
+                      values
+        cache_size -- maximum number of func values kept in the least
+                      recently used cache, integer >= 0, zero disables it
+        cache_quantum -- cache key quantization step, float >= 0,
+                         zero uses exact points
 
         Note:
             Function func(x) must be continuous for all:
@@ -60,10 +99,20 @@ class Function(object):
         if not (np.array(upper) > np.array(lower)).all():
             raise ValueError('lower must be less than upper for all elements')
 
+        if not cache_size >= 0:
+            raise ValueError('cache_size must be integer >= 0')
+
+        if not cache_quantum >= 0:
+            raise ValueError('cache_quantum must be float >= 0')
+
         self.func = func
         self.dim = dim
         self.lower = lower
         self.upper = upper
+        self.vectorized = vectorized
+        self.cache_size = cache_size
+        self.cache_quantum = cache_quantum
+        self.cache_clear()
 
     def __call__(self, x):
         """ 
@@ -78,8 +127,181 @@ class Function(object):
         if len(x) != self.dim:
             raise ValueError('number of func parameters different than dim')
 
+        if self.vectorized or self.cache_size:
+            return self.batch(np.reshape(x, (1, self.dim)))[0]
         return self.func(x)
 
+    def batch(self, x):
+        """ 
+        Returns numpy array of func values for every row of x.
+        Vectorized func is called once with the whole x, otherwise func is
+        called once per row.
+
+        Arguments:
+        x -- must be 2d numerical array of shape (n, dim)
+
+        Exceptions:
+            ValueError
+        """
+        x = np.asarray(x)
+        if x.ndim != 2 or x.shape[1] != self.dim:
+            raise ValueError('number of func parameters different than dim')
+
+        if self.cache_size:
+            return self._cached_batch(x)
+        return self._batch(x)
+
+    def cache_clear(self):
+        """
+        Empties the cache and resets cache_hits and cache_misses.
+        """
+        self._cache = collections.OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _cached_batch(self, x):
+        """
+        Returns func values for rows of x (2d numpy) from the cache, 
+        computes missing ones with one _batch call and caches them.
+        """
+        if self.cache_quantum:
+            keys = np.floor(x/self.cache_quantum + 0.5).astype(np.int64)
+        else:
+            keys = x.astype(float)
+        keys = [key.tostring() for key in keys]
+
+        cost = np.empty(len(x))
+        missing = collections.OrderedDict()
+        for i, key in enumerate(keys):
+            if key in self._cache:
+                cost[i] = self._cache[key] = self._cache.pop(key)
+                self.cache_hits += 1
+            elif key in missing:
+                missing[key].append(i)
+                self.cache_hits += 1
+            else:
+                missing[key] = [i]
+                self.cache_misses += 1
+
+        if missing:
+            first = [rows[0] for rows in missing.values()]
+            for key, rows, value in zip(missing, missing.values(), 
+                                        self._batch(x[first])):
+                cost[rows] = self._cache[key] = value
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return cost
+
+    def _batch(self, x):
+        """
+        Returns func values for rows of x (2d numpy) without the cache.
+        """
+        if self.vectorized:
+            cost = np.asarray(self.func(x), dtype=float)
+            if cost.shape != (len(x),):
+                raise ValueError('vectorized func must return one value '
+                                 'per row of x')
+            return cost
+        return np.array([self.func(p) for p in x], dtype=float)
+
+
+
+class FunctionStack(object):
+    """
+    Stack of count independent functions of the same dim, evaluated
+    together, minimized by find_min_many of DifferentialEvolutionSP.
+
+    Public members initialized in constructor:
+    func  -- functions to be minimized func(index, x) where index is 1d
+             numpy array of k problem indexes in [0, count) and x is 3d
+             numpy array of shape (k, n, dim), x[j] are points of problem
+             index[j], returns numerical array of shape (k, n)
+    count -- number of problems
+    dim   -- number of function parameters of every problem
+    lower -- lower bounds for function parameters, 2d numpy array of
+             shape (count, dim)
+    upper -- upper bounds for function parameters, 2d numpy array of
+             shape (count, dim)
+
+    Example:
+    >>> def func(index, x):
+    ...     # sphere of problem k has its minimum at (k, k)
+    ...     return ((x - index.reshape(-1, 1, 1))**2).sum(axis=2)
+    ...
+    >>> spheres = FunctionStack(func, 3, 2, (-10,-10), (10,10))
+    >>> spheres.lower.shape
+    (3, 2)
+    >>> spheres.batch([0, 2], [[[0, 0], [1, 1]], [[0, 0], [2, 2]]])
+    array([[0., 2.],
+           [8., 0.]])
+    """
+
+    def __init__(self, func, count, dim, lower, upper):
+        """
+        Initializes public members func, count, dim, lower and upper.
+
+        Arguments:
+        func  -- functions to be minimized func(index, x), see class
+        count -- number of problems, integer greater than zero
+        dim   -- number of function parameters of every problem
+        lower -- lower bounds, numerical sequence of length dim shared by
+                 all problems or 2d array of shape (count, dim)
+        upper -- upper bounds, numerical sequence of length dim shared by
+                 all problems or 2d array of shape (count, dim)
+
+        Exceptions:
+            TypeError, ValueError
+        """
+
+        if not hasattr(func, '__call__'):
+            raise TypeError('func is not a callable')
+
+        if not int(count) > 0:
+            raise ValueError('count must be positive integer')
+
+        if not int(dim) > 0:
+            raise ValueError('dim must be positive integer')
+
+        try:
+            lower = np.array(np.broadcast_to(lower, (count, dim)), 
+                             dtype=float)
+            upper = np.array(np.broadcast_to(upper, (count, dim)), 
+                             dtype=float)
+        except ValueError:
+            raise ValueError('lower and upper must be of length dim or '
+                             'shape (count, dim)')
+
+        if not (upper > lower).all():
+            raise ValueError('lower must be less than upper for all elements')
+
+        self.func = func
+        self.count = count
+        self.dim = dim
+        self.lower = lower
+        self.upper = upper
+
+    def batch(self, index, x):
+        """
+        Returns numpy array of shape (k, n) of func values for problems
+        index and their points x.
+
+        Arguments:
+        index -- numerical sequence of k problem indexes
+        x     -- 3d numerical array of shape (k, n, dim)
+
+        Exceptions:
+            ValueError
+        """
+        index = np.asarray(index)
+        x = np.asarray(x, dtype=float)
+        if x.ndim != 3 or x.shape[0] != len(index) or x.shape[2] != self.dim:
+            raise ValueError('x must be of shape (len(index), n, dim)')
+
+        cost = np.asarray(self.func(index, x), dtype=float)
+        if cost.shape != x.shape[:2]:
+            raise ValueError('func must return one value per point of x')
+        return cost
+
 
 # doctest
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import ctypes
+import multiprocessing as mp
+import traceback
+import numpy as np
+
+from function import Function
+from singleprocess import DifferentialEvolutionSP
+
+
+class DifferentialEvolutionMW(DifferentialEvolutionSP):
+    """
+    Differential Evolution algorithm - master-worker implementation.
+
+    The master process holds the whole population and runs the vectorized
+    DE algorithm of DifferentialEvolutionSP. Function evaluations of each
+    batch (initial population, trials of a generation) are scattered to
+    worker processes through shared memory and costs are gathered back.
+    For the same numpy.random seed the result is identical to
+    DifferentialEvolutionSP, only function evaluations run in parallel.
+
+    Public members initialized in constructor:
+    pop_size   -- population size, integer constant greater than zero
+                  (recomended at least 10x number of function parameters)
+    max_gen    -- maximum generations, integer constant greater than zero
+                  (recomended at least 1000)
+    cr         -- crossover constant, float in [0,1]
+    f          -- factor of differential amplification, float in [0,2]
+    proc_count -- number of worker processes, integer greater or equal to
+                  zero, if zero then multiprocessing.cpu_count() is used
+
+    Keyword arguments mutation (strategy, crossover and p_best), parameter
+    control (adaptation, memory_size and min_pop_size), polishing (polish,
+    polish_method, polish_interval and polish_evals), stopping criteria
+    (target_cost, cost_tol, x_tol, stagnation, max_evals and max_time),
+    checkpointing (checkpoint and checkpoint_interval) and instrumentation
+    (observer and observer_interval) are public members described in
+    _DifferentialEvolution. The reference loop (vectorized=False) can't
+    be used, it evaluates one trial at a time, find_min_many raises
+    ValueError.
+
+    Example:
+    >>> def func(x):
+    ...     return 100*(x[0]**2 - x[1])**2 + (1 - x[0])**2
+    >>>
+    >>> saddle = Function(func, dim=2, lower=(-2.048,)*2, upper=(2.048,)*2)
+    >>> de = DifferentialEvolutionMW(pop_size=40, max_gen=1000, cr=0.9, f=0.9,
+    ...                              proc_count=2)
+    >>> minimum, min_point = de.find_min(saddle)
+    >>>
+    >>> print "Min: f", tuple(min_point), "=", minimum
+    Min: f (1.0, 1.0) = 0.0
+    """
+
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5,
+                 proc_count=1, **kwargs):
+
+        super(DifferentialEvolutionMW, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
+
+        if not self.vectorized:
+            raise ValueError('master-worker requires vectorized=True')
+
+        if not proc_count >= 0:
+            raise ValueError('proc_count must be integer >= 0')
+
+        if proc_count == 0:
+            self.proc_count = mp.cpu_count()
+        else:
+            self.proc_count = proc_count
+
+    def find_min(self, func):
+        """
+        Returns tuple consisting of:
+        - function minimum
+        - point where function has a minimum (numpy array)
+        Sets stop_reason, generations and evaluations.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError, RuntimeError
+        """
+        return self._run_workers(
+            super(DifferentialEvolutionMW, self).find_min, func)
+
+    def resume(self, func):
+        """
+        Continues the run saved in checkpoint directory, see
+        DifferentialEvolutionSP.resume.
+
+        Exceptions:
+            TypeError, ValueError, IOError, RuntimeError
+        """
+        return self._run_workers(
+            super(DifferentialEvolutionMW, self).resume, func)
+
+    def find_min_many(self, funcs):
+        """
+        Not supported, find_min_many evaluates every problem in the
+        calling process, worker processes would be ignored.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('master-worker does not support find_min_many')
+
+    def _run_workers(self, run, func):
+        """
+        Returns run(func) called with worker processes started.
+        """
+        self._check_func(func)
+
+        # shared memory for a batch of points and their costs
+        self._shmem_x = mp.RawArray(ctypes.c_double, self.pop_size*func.dim)
+        self._shmem_cost = mp.RawArray(ctypes.c_double, self.pop_size)
+        self._batch_x = np.frombuffer(self._shmem_x).reshape(self.pop_size,
+                                                             func.dim)
+        self._batch_cost = np.frombuffer(self._shmem_cost)
+
+        # workers inherit func, nothing is pickled
+        self._tasks = mp.Queue()
+        self._done = mp.Queue()
+        proc_group = []
+        for i in range(self.proc_count):
+            proc = mp.Process(target=self._serve, args=(func,))
+            proc.daemon = True
+            proc.start()
+            proc_group.append(proc)
+
+        try:
+            return run(func)
+        finally:
+            for proc in proc_group:
+                self._tasks.put(None)
+            for proc in proc_group:
+                proc.join()
+
+    def _evaluate(self, func, x):
+        """
+        Returns costs of all rows of x (2d numpy), evaluated by workers.
+        Rows are copied to shared memory in blocks of pop_size, each block
+        is split among workers.
+
+        Exceptions:
+            RuntimeError
+        """
+        self.evaluations += len(x)
+        cost = np.empty(len(x))
+        for start in range(0, len(x), self.pop_size):
+            block = x[start : start + self.pop_size]
+            n = len(block)
+            self._batch_x[:n] = block
+
+            bounds = np.linspace(0, n, min(self.proc_count, n) + 1)
+            bounds = bounds.astype(int)
+            for i in range(len(bounds) - 1):
+                self._tasks.put((bounds[i], bounds[i+1]))
+
+            errors = [self._done.get() for i in range(len(bounds) - 1)]
+            errors = [error for error in errors if error is not None]
+            if errors:
+                raise RuntimeError('worker process failed:\n' + errors[0])
+            cost[start : start + n] = self._batch_cost[:n]
+        return cost
+
+    def _serve(self, func):
+        """
+        Worker process loop, evaluates rows [start,end) of shared memory
+        until it gets None. Puts None to _done queue on success, or
+        traceback string on error.
+        """
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            start, end = task
+            try:
+                self._batch_cost[start:end] = \
+                    func.batch(self._batch_x[start:end])
+                self._done.put(None)
+            except Exception:
+                self._done.put(traceback.format_exc())
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,13 +1,20 @@
 import ctypes
 import multiprocessing as mp
+import os
+import Queue
 import numpy as np
 import numpy.random as rnd
 
 from function import Function
-from diffevol import _DifferentialEvolution
+from diffevol import _DifferentialEvolution, STOP_REASONS
 from singleprocess import DifferentialEvolutionSP
 
 
+# migration topologies and replacement policies
+TOPOLOGIES = ('ring', 'random', 'full')
+REPLACEMENTS = ('worst', 'random')
+
+
 class DifferentialEvolutionMP(_DifferentialEvolution):
     """ 
     Differential Evolution algorithm - multi process implementation.
@@ -21,6 +28,45 @@ class DifferentialEvolutionMP(_DifferentialEvolution):
     f          -- factor of differential amplification, float in [0,2]
     proc_count -- number of processes, integer greater or equal to zero
                   if zero then multiprocessing.cpu_count() is used
+    migration_interval -- generations between migrations among processes
+                          (islands), integer >= 0, zero disables migration
+    migrants    -- number of best individuals an island sends, and number
+                   of individuals it may replace, per migration
+    topology    -- islands an island receives migrants from, one of
+                   TOPOLOGIES: 'ring' (previous island), 'random' (random
+                   other island) or 'full' (best of all other islands)
+    replacement -- individuals replaced by better migrants, one of
+                   REPLACEMENTS: 'worst' or 'random' (any but the best)
+
+    Keyword arguments vectorized, mutation (strategy, crossover and
+    p_best), parameter control (adaptation and memory_size), polishing
+    (polish, polish_method, polish_interval and polish_evals), stopping
+    criteria (target_cost, cost_tol, x_tol, stagnation, max_evals and
+    max_time), checkpointing (checkpoint and checkpoint_interval) and
+    instrumentation (observer and observer_interval) are public members
+    described in _DifferentialEvolution. Every process adapts f and cr,
+    polishes and checks the criteria on its own population slice,
+    max_evals is divided among processes in proportion to slice sizes.
+    Slices keep their size, so min_pop_size can't be used. Every process
+    saves its checkpoint to subdirectory island<index> of checkpoint
+    directory.
+
+    Processes report their counters every observer_interval generations,
+    observer is called in the calling process after every report with
+    counters of all processes (see _merge_stats). When observer returns
+    True, every process ends its run at its next report.
+
+    Population and costs are kept in shared memory, every process evolves
+    its slice in place. The shared memory is reused by following calls
+    with the same pop_size and number of function parameters, population()
+    returns views of it, readable while processes run.
+
+    Public members set by find_min and resume:
+    stop_reasons -- list of names of criteria that ended each process
+    stop_reason  -- name of the criterion that ended the process which
+                    found the minimum
+    generations  -- largest number of generations run by a process
+    evaluations  -- total number of function evaluations
 
     Example:
     >>> def func(x):
@@ -36,23 +82,48 @@ class DifferentialEvolutionMP(_DifferentialEvolution):
     """
 
     def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5, 
-                 proc_count=1):
+                 proc_count=1, migration_interval=0, migrants=1,
+                 topology='ring', replacement='worst', **kwargs):
 
-        super(DifferentialEvolutionMP, self).__init__(pop_size, max_gen, cr, f)
+        super(DifferentialEvolutionMP, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
 
         if not proc_count >= 0:
             raise ValueError('proc_count must be integer >= 0')
 
+        if self.min_pop_size:
+            raise ValueError('islands keep pop_size, min_pop_size must be '
+                             'zero')
+
+        if not migration_interval >= 0:
+            raise ValueError('migration_interval must be integer >= 0')
+
+        if not migrants > 0:
+            raise ValueError('migrants must be integer greater than zero')
+
+        if topology not in TOPOLOGIES:
+            raise ValueError('topology must be one of ' + str(TOPOLOGIES))
+
+        if replacement not in REPLACEMENTS:
+            raise ValueError('replacement must be one of ' + 
+                             str(REPLACEMENTS))
+
         if proc_count == 0:
             self.proc_count = mp.cpu_count()
         else:
             self.proc_count = proc_count
 
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.topology = topology
+        self.replacement = replacement
+
     def find_min(self, func):
         """
         Returns tuple consisting of:
         - function minimum
         - point where function has a minimum (numpy array)
+        Sets stop_reasons, stop_reason, generations and evaluations.
 
         Arguments:
         func -- function to be minimized, instance of Function
@@ -62,56 +133,293 @@ class DifferentialEvolutionMP(_DifferentialEvolution):
         """
         self._check_func(func)
 
+        return self._find_min(func, resume=False)
+
+    def resume(self, func):
+        """
+        Continues the run saved in checkpoint directory, every process
+        resumes its island, and returns the same as find_min. 
+        Proc_count and pop_size must be the same as in the saved run.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError, ValueError
+        """
+        self._check_func(func)
+        if self.checkpoint is None:
+            raise ValueError('checkpoint directory is not set')
+
+        return self._find_min(func, resume=True)
+
+    def _find_min(self, func, resume):
+        """
+        Runs islands, starting them from random or checkpointed
+        populations, and returns the same as find_min.
+        """
+        self._resume = resume
+        self._alloc_shmem(func.dim)
+        self._cost[:] = float('inf')
+        self._shmem_stop.value = 0
+        self._shmem_mig_cost[:] = [float('inf')]*len(self._shmem_mig_cost)
+
+        # every process gets its own seed so islands differ
+        self._seeds = rnd.randint(0, 2**31 - 1, self.proc_count)
+
+        self._run_islands(func)
+
+        # find min
+        min_index = self._cost.argmin()
+        slice_len = int(self.pop_size/self.proc_count)
+        self.stop_reasons = [STOP_REASONS[r] for r in self._shmem_reason]
+        self.stop_reason = self.stop_reasons[min(min_index/slice_len, 
+                                                 self.proc_count - 1)]
+        self.generations = max(self._shmem_gen)
+        self.evaluations = sum(self._shmem_evals)
+        return self._cost[min_index], self._x[min_index].copy()
+
+    def population(self):
+        """
+        Returns tuple of views (not copies) of shared memory of the last
+        or current run:
+        - population (2d numpy array of shape (pop_size, dim))
+        - costs of individuals (1d numpy array), infinite until evaluated
+        Processes write them in place while they run, so a view read during
+        the run may hold individuals of different generations.
+        Returns None before the first run.
+        """
+        if getattr(self, '_x', None) is None:
+            return None
+        return self._x, self._cost
+
+    def _slices(self):
+        """
+        Returns list of population slices (slice_start, slice_end), one per
+        process, the last slice takes the remainder of uneven division.
+        """
+        slice_len = int(self.pop_size/self.proc_count)
+        slices = [(i*slice_len, i*slice_len + slice_len) 
+                  for i in range(self.proc_count - 1)]
+        slices.append(((self.proc_count-1)*slice_len, self.pop_size))
+        return slices
+
+    def _alloc_shmem(self, dim):
+        """
+        Allocates shared raw arrays for population of dim parameters,
+        population arrays of the previous call are kept if their size
+        is the same. Sets _x and _cost to numpy views of them.
+        """
         # shared mememory among processes
-        self._shmem_cost = mp.RawArray(ctypes.c_double, self.pop_size)
-        self._shmem_x = mp.RawArray(ctypes.c_double, self.pop_size*func.dim)
+        if (getattr(self, '_shmem_x', None) is None or
+                len(self._shmem_x) != self.pop_size*dim):
+            self._shmem_cost = mp.RawArray(ctypes.c_double, self.pop_size)
+            self._shmem_x = mp.RawArray(ctypes.c_double, self.pop_size*dim)
+        self._cost = np.frombuffer(self._shmem_cost)
+        self._x = np.frombuffer(self._shmem_x).reshape(self.pop_size, dim)
+        self._shmem_reason = mp.RawArray(ctypes.c_int, self.proc_count)
+        self._shmem_gen = mp.RawArray(ctypes.c_long, self.proc_count)
+        self._shmem_evals = mp.RawArray(ctypes.c_long, self.proc_count)
 
+        # island observer reports and stop request of the observer
+        self._stats_queue = mp.Queue()
+        self._shmem_stop = mp.RawValue(ctypes.c_int, 0)
+
+        # shared migrant slots, one per island
+        self._shmem_mig_cost = mp.RawArray(ctypes.c_double, 
+                                           self.proc_count*self.migrants)
+        self._shmem_mig_x = mp.RawArray(ctypes.c_double, 
+                                        self.proc_count*self.migrants*dim)
+        self._mig_lock = mp.Lock()
+
+    def _run_islands(self, func):
+        """
+        Runs _run_de on every population slice in a new process.
+        """
         # create processes and population slices
-        slice_len = int(self.pop_size/self.proc_count)
         proc_group = []
-        for i in range(self.proc_count - 1):
-            slice_start = i*slice_len
-            slice_end = i*slice_len + slice_len
+        for i, (slice_start, slice_end) in enumerate(self._slices()):
             p = mp.Process(target=self._run_de, 
-                           args=(func, slice_start, slice_end))
+                           args=(func, i, slice_start, slice_end, 
+                                 self._resume))
             proc_group.append(p)
-        # handle uneven last slice
-        p = mp.Process(target=self._run_de, 
-                       args=(func, (self.proc_count-1)*slice_len, 
-                             self.pop_size))
-        proc_group.append(p)
 
         # start all then join all
         for proc in proc_group:
             proc.start()
+        if self.observer is not None:
+            self._observe(lambda: not any(proc.is_alive() 
+                                          for proc in proc_group))
         for proc in proc_group:
             proc.join()
 
-        # copy results from shared memory
-        self._cost = np.frombuffer(self._shmem_cost) 
-        self._x = np.reshape(np.frombuffer(self._shmem_x), 
-                             (self.pop_size, func.dim))
- 
-        # find min
-        min_index = self._cost.argmin()
-        return self._cost[min_index], self._x[min_index]
+    def _observe(self, finished):
+        """
+        Calls observer with merged counters of the last reports of all
+        processes after every report, until finished() returns True.
+        Sets the stop request when observer returns True.
+        """
+        latest = {}
+        while True:
+            try:
+                stats = self._stats_queue.get(timeout=0.05)
+            except Queue.Empty:
+                if finished():
+                    break
+                continue
+            latest[stats['island']] = stats
+            if self.observer(self._merge_stats(latest.values())):
+                self._shmem_stop.value = 1
+
+    def _merge_stats(self, reports):
+        """
+        Returns counters of all processes, see _run_stats, merged from
+        their last reports: generations and elapsed are the largest,
+        best_cost the lowest, gen_rate, mean_cost and diversity the mean,
+        other counters are summed. Key islands holds the reports sorted by
+        process index, each with key island.
+        """
+        reports = sorted(reports, key=lambda stats: stats['island'])
+        merged = dict(islands=reports)
+        for key in ('evaluations', 'eval_time', 'overhead', 'evals_per_sec'):
+            merged[key] = sum(stats[key] for stats in reports)
+        for key in ('generations', 'elapsed'):
+            merged[key] = max(stats[key] for stats in reports)
+        for key in ('gen_rate', 'mean_cost', 'diversity'):
+            merged[key] = sum(stats[key] for stats in reports)/len(reports)
+        merged['best_cost'] = min(stats['best_cost'] for stats in reports)
+        return merged
  
-    def _run_de(self, func, slice_start, slice_end):
+    def _run_de(self, func, proc, slice_start, slice_end, resume=False):
         """
         Implementation of DE algorithm.
-        It's run in a process that creates and runs DifferentialEvolutionSP.
-        Populates _shmem_cost and population _shmem_x shared raw arrays.
+        It's run in a process that creates and runs DifferentialEvolutionSP,
+        or resumes its checkpoint, on views of slice_start:slice_end rows
+        of shared _x and _cost, so the slice evolves in shared memory.
+        Populates stopping reason and counters of the process proc.
         """ 
          # run single process de on a population slice
+        rnd.seed(self._seeds[proc])
         slice_size = slice_end - slice_start
+        options = self._option_dict()
+        if self.max_evals:
+            options['max_evals'] = max(1, self.max_evals*slice_size/
+                                          self.pop_size)
+        if self.checkpoint is not None:
+            options['checkpoint'] = os.path.join(self.checkpoint, 
+                                                 'island%d' % proc)
+        if self.observer is not None:
+            options['observer'] = _IslandObserver(self, proc)
         sp = DifferentialEvolutionSP(slice_size, self.max_gen, 
-                                     self.cr, self.f)
-        sp.find_min(func)
+                                     self.cr, self.f, **options)
+        sp._views = (self._x[slice_start : slice_end], 
+                     self._cost[slice_start : slice_end])
+        sp._generation_hooks = list(self._generation_hooks)
+        if self.migration_interval and self.proc_count > 1:
+            sp._generation_hooks.append(_Migration(self, proc, func.dim))
+        if resume:
+            sp.resume(func)
+        else:
+            sp.find_min(func)
+        self._shmem_reason[proc] = STOP_REASONS.index(sp.stop_reason)
+        self._shmem_gen[proc] = sp.generations
+        self._shmem_evals[proc] = sp.evaluations
+
+
+class _Migration(object):
+    """
+    Generation hook of an island process, exchanges individuals with
+    other islands through shared migrant slots of DifferentialEvolutionMP.
+
+    Every migration_interval generations the island copies its best
+    individuals to its own slot, then takes the best migrants from the
+    slots of its source islands and replaces its individuals chosen by
+    replacement policy if migrants are better. Islands don't wait for each
+    other, an island reads whatever its sources published last.
+    """
+
+    def __init__(self, de, island, dim):
+        """
+        Arguments:
+        de     -- DifferentialEvolutionMP that owns shared migrant slots
+        island -- index of the island (process)
+        dim    -- number of function parameters
+        """
+        self.island = island
+        self.island_count = de.proc_count
+        self.interval = de.migration_interval
+        self.count = de.migrants
+        self.topology = de.topology
+        self.replacement = de.replacement
+        self.lock = de._mig_lock
+        self.mig_cost = np.frombuffer(de._shmem_mig_cost).reshape(
+            self.island_count, self.count)
+        self.mig_x = np.frombuffer(de._shmem_mig_x).reshape(
+            self.island_count, self.count, dim)
+
+    def __call__(self, de):
+        if de.generations % self.interval:
+            return
+
+        count = min(self.count, len(de._cost) - 1)
+        best = np.argsort(de._cost)[:count]
+        sources = self._sources()
+        with self.lock:
+            self.mig_cost[self.island] = float('inf')
+            self.mig_cost[self.island, :count] = de._cost[best]
+            self.mig_x[self.island, :count] = de._x[best]
+            cost = self.mig_cost[sources].ravel()
+            x = self.mig_x[sources].reshape(len(cost), -1)
+
+        # best migrants, empty slots have infinite cost
+        order = np.argsort(cost)[:count]
+        cost, x = cost[order], x[order]
+
+        targets = self._targets(de._cost, count)
+        accept = cost < de._cost[targets]
+        de._x[targets[accept]] = x[accept]
+        de._cost[targets[accept]] = cost[accept]
+
+    def _sources(self):
+        """
+        Returns list of islands that send migrants to this island.
+        """
+        others = [i for i in range(self.island_count) if i != self.island]
+        if self.topology == 'ring':
+            return [(self.island - 1) % self.island_count]
+        if self.topology == 'random':
+            return [others[rnd.randint(0, len(others))]]
+        return others
+
+    def _targets(self, cost, count):
+        """
+        Returns count indexes of individuals that migrants may replace.
+        """
+        order = np.argsort(cost)
+        if self.replacement == 'worst':
+            return order[::-1][:count]
+        return rnd.permutation(order[1:])[:count]
+
+
+class _IslandObserver(object):
+    """
+    Observer of an island process, puts island counters to the report
+    queue of DifferentialEvolutionMP and returns its stop request.
+    """
+
+    def __init__(self, de, island):
+        """
+        Arguments:
+        de     -- DifferentialEvolutionMP running the island
+        island -- index of the island process
+        """
+        self.de = de
+        self.island = island
 
-        # copy results to shared memory
-        self._shmem_cost[slice_start : slice_end] = sp._cost[:]
-        self._shmem_x[slice_start*func.dim : slice_end*func.dim] = \
-            sp._x.flatten()
+    def __call__(self, stats):
+        stats['island'] = self.island
+        self.de._stats_queue.put(stats)
+        return bool(self.de._shmem_stop.value)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+import multiprocessing as mp
+import Queue
+import traceback
+import numpy as np
+
+from function import Function
+from multiprocess import DifferentialEvolutionMP
+
+
+class DifferentialEvolutionPool(DifferentialEvolutionMP):
+    """
+    Differential Evolution algorithm - multi process implementation with
+    a persistent pool of processes.
+
+    Works like DifferentialEvolutionMP, but processes and shared memory
+    are created by the first find_min call and reused by the following
+    ones. They are recreated only when pop_size, proc_count, migrants or
+    number of function parameters changes. Other public members may be
+    changed between calls. Func passed to find_min and generation hooks
+    must be picklable (defined at module level), they are sent to pool
+    processes by every call.
+
+    Use it as a context manager, or call close() to stop the processes.
+
+    Public members initialized in constructor are the same as in
+    DifferentialEvolutionMP.
+
+    Example:
+    >>> norm = Function(np.linalg.norm, dim=2, lower=(-2.048,)*2, 
+    ...                 upper=(2.048,)*2)
+    >>> 
+    >>> with DifferentialEvolutionPool(pop_size=40, cr=0.9, f=0.9,
+    ...                                proc_count=2) as de:
+    ...     for i in range(3):
+    ...         minimum, min_point = de.find_min(norm)
+    ...         print "Min:", round(minimum, 5)
+    Min: 0.0
+    Min: 0.0
+    Min: 0.0
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes public members, arguments are the same as in
+        DifferentialEvolutionMP.
+
+        Exceptions:
+            ValueError
+        """
+        super(DifferentialEvolutionPool, self).__init__(*args, **kwargs)
+        self._proc_group = []
+        self._shape = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        """
+        Stops pool processes, the next find_min call starts them again.
+        """
+        for proc in self._proc_group:
+            self._tasks.put(None)
+        for proc in self._proc_group:
+            proc.join()
+        self._proc_group = []
+        self._shape = None
+
+    def _alloc_shmem(self, dim):
+        """
+        Allocates shared raw arrays and starts pool processes, unless
+        the ones of the previous call have the same shape.
+        """
+        shape = (self.pop_size, self.proc_count, self.migrants, dim)
+        if shape == self._shape:
+            return
+
+        self.close()
+        super(DifferentialEvolutionPool, self)._alloc_shmem(dim)
+        self._tasks = mp.Queue()
+        self._done = mp.Queue()
+        for i in range(self.proc_count):
+            proc = mp.Process(target=self._serve)
+            proc.daemon = True
+            proc.start()
+            self._proc_group.append(proc)
+        self._shape = shape
+
+    def _run_islands(self, func):
+        """
+        Sends every population slice to pool processes and waits until
+        all of them are done.
+
+        Exceptions:
+            RuntimeError
+        """
+        params = self._param_dict()
+        for i, (slice_start, slice_end) in enumerate(self._slices()):
+            self._tasks.put((func, params, self._seeds, self._generation_hooks,
+                             i, slice_start, slice_end, self._resume))
+
+        errors = []
+        def finished():
+            while True:
+                try:
+                    errors.append(self._done.get_nowait())
+                except Queue.Empty:
+                    return len(errors) == len(self._proc_group)
+        if self.observer is not None:
+            self._observe(finished)
+        errors += [self._done.get() 
+                   for i in range(len(self._proc_group) - len(errors))]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise RuntimeError('pool process failed:\n' + errors[0])
+
+    def _param_dict(self):
+        """
+        Returns dictionary of public members with their current values.
+        Observer stays in this process, pool processes only learn whether
+        it is set.
+        """
+        params = dict((name, value) for name, value in vars(self).items()
+                      if not name.startswith('_'))
+        params['observer'] = self.observer and True
+        return params
+
+    def _serve(self):
+        """
+        Pool process loop, runs _run_de for every task until it gets None.
+        Puts None to _done queue on success, or traceback string on error.
+        """
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            func, params, self._seeds, self._generation_hooks = task[:4]
+            vars(self).update(params)
+            try:
+                self._run_de(func, *task[4:])
+                self._done.put(None)
+            except Exception:
+                self._done.put(traceback.format_exc())
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,8 +1,10 @@
+import time
 import numpy as np
 import numpy.random as rnd
 
-from function import Function
-from diffevol import _DifferentialEvolution
+from function import Function, FunctionStack
+from diffevol import _DifferentialEvolution, STOP_REASONS
+from checkpoint import Checkpoint
 
 
 class DifferentialEvolutionSP(_DifferentialEvolution):
@@ -17,6 +19,19 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
     cr       -- crossover constant, float in [0,1]
     f        -- factor of differential amplification, float in [0,2]
 
+    Keyword arguments vectorized, mutation (strategy, crossover and
+    p_best), parameter control (adaptation, memory_size and min_pop_size),
+    polishing (polish, polish_method, polish_interval and polish_evals),
+    stopping criteria (target_cost, cost_tol, x_tol, stagnation, max_evals
+    and max_time), checkpointing (checkpoint and checkpoint_interval) and
+    instrumentation (observer and observer_interval) are public members
+    described in _DifferentialEvolution.
+
+    Public members set by find_min and resume:
+    stop_reason -- name of the criterion that ended the run
+    generations -- number of generations run
+    evaluations -- number of function evaluations
+
     Example:
     >>> def func(x):
     ...     return 100*(x[0]**2 - x[1])**2 + (1 - x[0])**2
@@ -27,9 +42,36 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
     >>> 
     >>> print "Min: f", tuple(min_point), "=", minimum
     Min: f (1.0, 1.0) = 0.0
+    >>> 
+    >>> de = DifferentialEvolutionSP(pop_size=40, cr=0.9, f=0.9, 
+    ...                              target_cost=1e-7)
+    >>> minimum, min_point = de.find_min(saddle)
+    >>> de.stop_reason
+    'target_cost'
+    >>> 
+    >>> trajectory = []
+    >>> def observer(stats):
+    ...     trajectory.append(stats['best_cost'])
+    ...     return stats['best_cost'] < 1e-3
+    >>> de = DifferentialEvolutionSP(pop_size=40, cr=0.9, f=0.9,
+    ...                              observer=observer, observer_interval=10)
+    >>> minimum, min_point = de.find_min(saddle)
+    >>> de.stop_reason, de.generations == 10*len(trajectory)
+    ('cancelled', True)
+    >>> 
+    >>> def saddles(index, x):
+    ...     # saddle of problem k is scaled by k + 1
+    ...     return (index.reshape(-1, 1) + 1)*func(x.transpose(2, 0, 1))
+    >>> 
+    >>> stack = FunctionStack(saddles, 100, 2, (-2.048,)*2, (2.048,)*2)
+    >>> de = DifferentialEvolutionSP(pop_size=40, cr=0.9, f=0.9, 
+    ...                              target_cost=1e-7)
+    >>> minimums, min_points = de.find_min_many(stack)
+    >>> minimums.shape, min_points.shape, (minimums <= 1e-7).all()
+    ((100,), (100, 2), True)
     """
 
-    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5):
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5, **kwargs):
         """
         Initializes public members pop_size, max_gen, cr and f.
 
@@ -41,17 +83,28 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
         cr       -- crossover constant, float in [0,1]
         f        -- factor of differential amplification, float in [0,2]
 
+        Keyword arguments:
+        vectorized, mutation, parameter control, polishing, stopping
+        criteria, checkpointing and instrumentation, see
+        _DifferentialEvolution
+
         Exceptions:
             ValueError
         """
 
-        super(DifferentialEvolutionSP, self).__init__(pop_size, max_gen, cr, f)
+        super(DifferentialEvolutionSP, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
+
+        # (x, cost) numpy arrays the population is kept in during the run,
+        # e.g. shared memory views, None allocates new ones
+        self._views = None
 
     def find_min(self, func):
         """
         Returns tuple consisting of:
         - function minimum
         - point where function has a minimum (numpy array)
+        Sets stop_reason, generations and evaluations.
 
         Arguments:
         func -- function to be minimized, instance of Function
@@ -64,24 +117,432 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
         self._run_de(func)
         min_index = self._cost.argmin()
         return self._cost[min_index], self._x[min_index]
+
+    def find_min_many(self, funcs):
+        """
+        Minimizes many independent problems of the same dim in one run.
+        Populations of all problems are stacked into array of shape
+        (count, pop_size, dim) and every generation is built for all of
+        them at once with numpy array operations. Every problem stops by
+        its own stopping criteria: target_cost, cost_tol, x_tol, stagnation
+        and max_evals apply to each problem, max_gen and max_time to the
+        run. Stopped problems keep their populations and are no longer
+        evaluated. Adaptation, min_pop_size, polishing, checkpointing and
+        observer are not supported, evaluation is done in the calling
+        process.
+
+        Returns tuple consisting of:
+        - function minimums (1d numpy array of count values)
+        - points where functions have minimums (2d numpy array of shape
+          (count, dim))
+        Sets stop_reasons (list of criteria that ended each problem),
+        problem_generations (1d numpy array of generations of each
+        problem), stop_reason (criterion that ended the last problems),
+        generations and evaluations (of all problems).
+
+        Arguments:
+        funcs -- FunctionStack, or sequence of Function instances of the
+                 same dim, evaluated one problem at a time
+
+        Exceptions:
+            TypeError, ValueError
+        """
+        if isinstance(funcs, FunctionStack):
+            lower = funcs.lower
+            upper = funcs.upper
+        else:
+            funcs = list(funcs)
+            for func in funcs:
+                self._check_func(func)
+            if not funcs or len(set(func.dim for func in funcs)) != 1:
+                raise ValueError('funcs must be FunctionStack or nonempty '
+                                 'sequence of Functions of the same dim')
+            lower = np.array([func.lower for func in funcs], dtype=float)
+            upper = np.array([func.upper for func in funcs], dtype=float)
+
+        if (self.adaptation or self.min_pop_size or self.polish or
+                self.checkpoint is not None or self.observer is not None):
+            raise ValueError('find_min_many does not support adaptation, '
+                             'min_pop_size, polish, checkpoint and observer')
+
+        count, dim = lower.shape
+        lower = lower.reshape(count, 1, dim)
+        upper = upper.reshape(count, 1, dim)
+        self._start_run()
+        self._x = rnd.rand(count, self.pop_size, dim)*(upper - lower) + lower
+        self._cost = self._evaluate_many(funcs, np.arange(count), self._x)
+        self._best_costs = np.full(count, np.inf)
+        self._stagnants = np.zeros(count, dtype=int)
+        self.problem_generations = np.zeros(count, dtype=int)
+        reasons = np.full(count, -1, dtype=int)
+
+        active = np.arange(count)
+        while True:
+            reasons[active] = self._check_stop_many(active)
+            running = active[reasons[active] < 0]
+            if not len(running):
+                break
+            active = running
+
+            x = self._x[active]
+            cost = self._cost[active]
+            trial = self._trial_many(x, cost, lower[active], upper[active])
+            score = self._evaluate_many(funcs, active, trial)
+            better = score <= cost
+            x[better] = trial[better]
+            cost[better] = score[better]
+            self._x[active] = x
+            self._cost[active] = cost
+            self.problem_generations[active] += 1
+            self.generations += 1
+
+        self.stop_reasons = [STOP_REASONS[reason] for reason in reasons]
+        self.stop_reason = STOP_REASONS[reasons[active[0]]]
+        best = self._cost.argmin(axis=1)
+        problems = np.arange(count)
+        return self._cost[problems, best], self._x[problems, best]
+
+    def resume(self, func):
+        """
+        Continues the run saved in checkpoint directory, restores the
+        population, counters and numpy.random state, and returns the same
+        as find_min. Stopping criteria apply to the whole run, so max_gen,
+        max_evals or max_time may be increased before resuming.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError, ValueError, IOError
+        """
+        self._check_func(func)
+        if self.checkpoint is None:
+            raise ValueError('checkpoint directory is not set')
+
+        self._run_de(func, resume=True)
+        min_index = self._cost.argmin()
+        return self._cost[min_index], self._x[min_index]
  
-    def _run_de(self, func):
+    def _run_de(self, func, resume=False):
         """
         Implementation of DE algorithm
         Populates _cost (1d numpy) and population _x (2d numpy) 
         """ 
+        self._start_run()
+        self._checkpointer = None
+        if self.checkpoint is not None:
+            self._checkpointer = Checkpoint(self.checkpoint)
+
+        if resume:
+            self._checkpointer.load(self)
+            # a reduced population is shorter than pop_size
+            size, dim = self._x.shape
+            if dim != func.dim or not (size == self.pop_size or
+                                       self.min_pop_size <= size <
+                                       self.pop_size):
+                raise ValueError('checkpoint population shape differs '
+                                 'from (pop_size, dim)')
+            if (self.adaptation == 'jde' and len(self._f_ind) != size or
+                    self.adaptation == 'shade' and
+                    len(self._memory_f) != self.memory_size):
+                raise ValueError('checkpoint adaptation state differs '
+                                 'from adaptation and memory_size')
+        else:
+            lower = np.array(func.lower)
+            upper = np.array(func.upper)
+            self._x = rnd.rand(self.pop_size, func.dim)*(upper - lower) + lower
+            start = time.time()
+            self._cost = self._evaluate(func, self._x)
+            self._eval_time += time.time() - start
+            self._start_adaptation()
+
+        if self._views is not None:
+            x, cost = self._views
+            x[:] = self._x
+            cost[:] = self._cost
+            self._x, self._cost = x, cost
+
+        self._run_generations(func)
+        if self.polish and self.stop_reason != 'cancelled':
+            self._polish(func)
+        if self._checkpointer is not None:
+            self._checkpointer.save(self)
+
+    def _run_generations(self, func):
+        """
+        Runs generations of the initialized population until a stopping
+        criterion is met.
+        """
+        if self.vectorized:
+            self._run_de_vectorized(func)
+        else:
+            self._run_de_loop(func)
+
+    def _run_de_vectorized(self, func):
+        """
+        Vectorized implementation of DE algorithm.
+        Each generation builds mutants, crossover masks, bound repairs and
+        selection for the whole population with numpy array operations.
+        Random numbers are drawn in bulk once per generation.
+        """
+        lower = np.array(func.lower, dtype=float)
+        upper = np.array(func.upper, dtype=float)
+
+        while not self._check_stop(self._x, self._cost):
+            f, cr = self._control()
+            mutant = self._mutate(f)
+            cross = self._cross(mutant.shape[0], mutant.shape[1], cr)
+            trial = np.where(cross, mutant, self._x)
+
+            # replace out of bounds elements with random ones
+            out_row, out_col = np.nonzero((trial < lower) | (trial > upper))
+            if len(out_col):
+                trial[out_row, out_col] = (
+                    rnd.rand(len(out_col))*(upper - lower)[out_col] + 
+                    lower[out_col])
+
+            start = time.time()
+            score = self._evaluate(func, trial)
+            self._eval_time += time.time() - start
+            improvement = self._cost - score
+            self._adapt(improvement)
+            better = improvement >= 0
+            self._x[better] = trial[better]
+            self._cost[better] = score[better]
+            self._reduce_population()
+            if self._polish_due():
+                self._polish(func)
+            self._end_generation()
+
+    def _mutate(self, f):
+        """
+        Returns mutants (2d numpy) of the whole population by strategy.
+
+        Arguments:
+        f -- factor of differential amplification, float or (n, 1) numpy
+             column of per individual factors
+        """
+        return self._mutate_stack(self._x[np.newaxis], 
+                                  self._cost[np.newaxis], f)[0]
+
+    def _mutate_stack(self, x, cost, f):
+        """
+        Returns mutants (3d numpy) of stacked populations x of shape
+        (k, n, dim) with costs cost of shape (k, n) by strategy, every
+        population mutates within itself.
+        """
+        k, n, dim = x.shape
+        rows = np.arange(k).reshape(k, 1)
+        if self.strategy == 'rand/1':
+            a, b, c = np.rollaxis(self._unique_index_stack(k, n, 3), 2)
+            return x[rows, c] + f*(x[rows, a] - x[rows, b])
+        if self.strategy == 'rand/2':
+            a, b, c, d, e = np.rollaxis(self._unique_index_stack(k, n, 5), 2)
+            return (x[rows, e] + f*(x[rows, a] - x[rows, b]) + 
+                    f*(x[rows, c] - x[rows, d]))
+
+        a, b = np.rollaxis(self._unique_index_stack(k, n, 2), 2)
+        diff = f*(x[rows, a] - x[rows, b])
+        if self.strategy in ('best/1', 'current-to-best/1'):
+            best = x[rows, cost.argmin(axis=1).reshape(k, 1)]
+            if self.strategy == 'best/1':
+                return best + diff
+            return x + f*(best - x) + diff
+
+        # current-to-pbest/1
+        count = max(1, int(round(self.p_best*n)))
+        best = np.argsort(cost, axis=1)[:, :count]
+        pbest = x[rows, best[rows, rnd.randint(0, count, (k, n))]]
+        return x + f*(pbest - x) + diff
+
+    def _cross(self, n, dim, cr):
+        """
+        Returns (n, dim) boolean mask of trial elements taken from mutants
+        by crossover, one random element of every row is always set.
+
+        Arguments:
+        cr -- crossover constant, float or (n, 1) numpy column of per
+              individual constants
+        """
+        if self.crossover == 'bin':
+            cross = rnd.rand(n, dim) < cr
+            cross[np.arange(n), rnd.randint(0, dim, n)] = True
+            return cross
+
+        # exp, the run goes on while random numbers are below cr
+        start = rnd.randint(0, dim, n)
+        more = rnd.rand(n, dim - 1) < cr
+        length = 1 + np.cumprod(more, axis=1).sum(axis=1)
+        offset = (np.arange(dim) - start.reshape(n, 1)) % dim
+        return offset < length.reshape(n, 1)
+
+    def _trial_many(self, x, cost, lower, upper):
+        """
+        Returns trials (3d numpy) of stacked populations x of shape
+        (k, n, dim) with costs cost, out of bounds elements are replaced
+        with random ones within bounds lower and upper of shape (k, 1, dim).
+        """
+        k, n, dim = x.shape
+        mutant = self._mutate_stack(x, cost, self.f)
+        cross = self._cross(k*n, dim, self.cr).reshape(k, n, dim)
+        trial = np.where(cross, mutant, x)
+
+        out = (trial < lower) | (trial > upper)
+        if out.any():
+            low = np.broadcast_to(lower, trial.shape)[out]
+            span = np.broadcast_to(upper - lower, trial.shape)[out]
+            trial[out] = rnd.rand(len(low))*span + low
+        return trial
+
+    def _evaluate_many(self, funcs, index, x):
+        """
+        Returns costs (2d numpy) of stacked points x of shape (k, n, dim)
+        of problems index of funcs, see find_min_many.
+        """
+        start = time.time()
+        if isinstance(funcs, FunctionStack):
+            cost = funcs.batch(index, x)
+        else:
+            cost = np.array([funcs[i].batch(points) 
+                             for i, points in zip(index, x)])
+        self._eval_time += time.time() - start
+        self.evaluations += cost.size
+        return cost
+
+    def _check_stop_many(self, active):
+        """
+        Checks stopping criteria of problems active (1d numpy of indexes)
+        of find_min_many, called once before every generation. Returns 1d
+        numpy array of indexes to STOP_REASONS of the first criterion met
+        by each problem, -1 where none is met.
+        """
+        x = self._x[active]
+        cost = self._cost[active]
+        best = cost.min(axis=1)
+        self._stagnants[active] = np.where(best < self._best_costs[active],
+                                           0, self._stagnants[active] + 1)
+        self._best_costs[active] = np.minimum(best, self._best_costs[active])
+
+        # rows in the order of STOP_REASONS, without 'cancelled'
+        met = np.zeros((7, len(active)), dtype=bool)
+        if self.target_cost is not None:
+            met[0] = best <= self.target_cost
+        if self.cost_tol:
+            met[1] = cost.max(axis=1) - best <= self.cost_tol
+        if self.x_tol:
+            met[2] = (x.max(axis=1) - x.min(axis=1)).max(axis=1) <= self.x_tol
+        if self.stagnation:
+            met[3] = self._stagnants[active] >= self.stagnation
+        met[4] = self.generations >= self.max_gen
+        if self.max_evals:
+            met[5] = ((self.problem_generations[active] + 2)*self.pop_size > 
+                      self.max_evals)
+        if self.max_time:
+            met[6] = time.time() - self._start_time >= self.max_time
+        return np.where(met.any(axis=0), met.argmax(axis=0), -1)
+
+    def _start_adaptation(self):
+        """
+        Initializes per individual f and cr of 'jde' or the success history
+        memory of 'shade' with f and cr.
+        """
+        if self.adaptation == 'jde':
+            self._f_ind = np.full(len(self._x), float(self.f))
+            self._cr_ind = np.full(len(self._x), float(self.cr))
+        elif self.adaptation == 'shade':
+            self._memory_f = np.full(self.memory_size, float(self.f))
+            self._memory_cr = np.full(self.memory_size, float(self.cr))
+            self._memory_next = 0
+
+    def _control(self):
+        """
+        Returns f and cr of the generation trials, the constants without
+        adaptation, otherwise (n, 1) numpy columns of per individual values
+        kept in _trial_f and _trial_cr for _adapt.
+        """
+        if self.adaptation is None:
+            return self.f, self.cr
+
+        n = len(self._x)
+        if self.adaptation == 'jde':
+            f = np.where(rnd.rand(n) < 0.1, 0.1 + 0.9*rnd.rand(n), 
+                         self._f_ind)
+            cr = np.where(rnd.rand(n) < 0.1, rnd.rand(n), self._cr_ind)
+        else:
+            slot = rnd.randint(0, self.memory_size, n)
+            cr = np.clip(rnd.normal(self._memory_cr[slot], 0.1), 0, 1)
+            f = self._memory_f[slot] + 0.1*rnd.standard_cauchy(n)
+            # nonpositive f is drawn again, large f is truncated
+            redraw = f <= 0
+            while redraw.any():
+                f[redraw] = (self._memory_f[slot[redraw]] + 
+                             0.1*rnd.standard_cauchy(redraw.sum()))
+                redraw = f <= 0
+            f = np.minimum(f, 1.)
+
+        self._trial_f = f
+        self._trial_cr = cr
+        return f.reshape(n, 1), cr.reshape(n, 1)
+
+    def _adapt(self, improvement):
+        """
+        Updates adaptation state by trial results.
+
+        Arguments:
+        improvement -- cost of target minus cost of trial (1d numpy),
+                       trials with improvement >= 0 replace their targets
+        """
+        if self.adaptation == 'jde':
+            better = improvement >= 0
+            self._f_ind[better] = self._trial_f[better]
+            self._cr_ind[better] = self._trial_cr[better]
+        elif self.adaptation == 'shade':
+            success = improvement > 0
+            if not success.any():
+                return
+            weight = improvement[success]/improvement[success].sum()
+            f = self._trial_f[success]
+            self._memory_f[self._memory_next] = ((weight*f**2).sum()/
+                                                 (weight*f).sum())
+            self._memory_cr[self._memory_next] = (
+                weight*self._trial_cr[success]).sum()
+            self._memory_next = (self._memory_next + 1) % self.memory_size
+
+    def _reduce_population(self):
+        """
+        Removes the worst individuals (and their adaptation state) down to
+        the size of linear population reduction, if min_pop_size is set.
+        """
+        if not self.min_pop_size:
+            return
+
+        if self.max_evals:
+            progress = float(self.evaluations)/self.max_evals
+        else:
+            progress = float(self.generations + 1)/self.max_gen
+        size = int(round(self.pop_size - 
+                         (self.pop_size - self.min_pop_size)*min(progress, 1)))
+        size = max(size, self.min_pop_size)
+        if size >= len(self._x):
+            return
+
+        keep = np.sort(np.argsort(self._cost, kind='mergesort')[:size])
+        self._x = self._x[keep]
+        self._cost = self._cost[keep]
+        if self.adaptation == 'jde':
+            self._f_ind = self._f_ind[keep]
+            self._cr_ind = self._cr_ind[keep]
+
+    def _run_de_loop(self, func):
+        """
+        Reference implementation of DE algorithm, one element at a time.
+        """
         dim = func.dim
         lower = np.array(func.lower)
         upper = np.array(func.upper)
-
-        self._x = rnd.rand(self.pop_size, dim)*(upper - lower) + lower
-        self._cost = np.zeros(self.pop_size)
         trial = np.zeros(dim)
 
-        for i in range(self.pop_size):
-            self._cost[i] = func(self._x[i])
-
-        for g in range(self.max_gen):
+        while not self._check_stop(self._x, self._cost):
             for i in range(self.pop_size): 
                 a, b, c = self._unique_indexes(i, self.pop_size);
                 j = rnd.randint(0, dim)
@@ -97,10 +558,174 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
                         trial[j] = self._x[i,j]
                     j = (j+1) % dim
 
+                start = time.time()
                 score = func(trial)
+                self._eval_time += time.time() - start
+                self.evaluations += 1
                 if score <= self._cost[i]:
                     self._x[i] = np.copy(trial)
                     self._cost[i] = score
+            if self._polish_due():
+                self._polish(func)
+            self._end_generation()
+
+    def _polish_due(self):
+        """
+        Returns True if the generation being finished is polished.
+        """
+        return bool(self.polish and self.polish_interval and 
+                    (self.generations + 1) % self.polish_interval == 0)
+
+    def _polish(self, func):
+        """
+        Refines polish best individuals of the population in place by
+        polish_method local search, started with steps of half of the
+        population spread. Points are clipped to Function bounds.
+        """
+        lower = np.array(func.lower, dtype=float)
+        upper = np.array(func.upper, dtype=float)
+        min_step = 1e-12*(upper - lower)
+        spread = self._x.max(axis=0) - self._x.min(axis=0)
+        if self.polish_method == 'nelder-mead':
+            search = self._nelder_mead
+        else:
+            search = self._compass_search
+
+        for i in np.argsort(self._cost)[:self.polish]:
+            step = np.maximum(0.5*spread, 1e3*min_step)
+            self._x[i], self._cost[i] = search(func, self._x[i], 
+                                               self._cost[i], step, lower,
+                                               upper, min_step)
+
+    def _polish_evaluate(self, func, x):
+        """
+        Returns costs of rows of x (2d numpy) evaluated for polishing.
+        """
+        start = time.time()
+        cost = self._evaluate(func, x)
+        self._eval_time += time.time() - start
+        return cost
+
+    def _polish_allows(self, used, count):
+        """
+        Returns True if a search that used evaluations may evaluate count
+        more points within polish_evals, max_evals and max_time.
+        """
+        if used + count > self.polish_evals:
+            return False
+        if self.max_evals and self.evaluations + count > self.max_evals:
+            return False
+        return not (self.max_time and 
+                    time.time() - self._start_time >= self.max_time)
+
+    def _compass_search(self, func, x, cost, step, lower, upper, min_step):
+        """
+        Returns (x, cost) improved by compass search from x with cost.
+        Every search step evaluates both neighbours along each parameter
+        in one batch and moves to the best improving one, or halves the
+        steps. Ends when all steps are below min_step or the budget is
+        used.
+        """
+        dim = len(x)
+        moves = np.vstack((np.eye(dim), -np.eye(dim)))
+        used = 0
+        while (step > min_step).any() and self._polish_allows(used, 2*dim):
+            trial = np.clip(x + moves*step, lower, upper)
+            score = self._polish_evaluate(func, trial)
+            used += 2*dim
+
+            best = score.argmin()
+            if score[best] < cost:
+                x = trial[best]
+                cost = score[best]
+            else:
+                step = 0.5*step
+        return x, cost
+
+    def _nelder_mead(self, func, x, cost, step, lower, upper, min_step):
+        """
+        Returns (x, cost) improved by Nelder-Mead simplex search from x with
+        cost. The initial simplex adds step to each parameter of x, the
+        simplex moves by reflection, expansion, contraction and shrink,
+        with points clipped to bounds. Ends when the simplex extent is
+        below min_step in every parameter or the budget is used.
+        """
+        dim = len(x)
+        if not self._polish_allows(0, dim):
+            return x, cost
+        simplex = np.vstack((x, np.clip(x + np.diag(step), lower, upper)))
+        costs = np.hstack((cost, self._polish_evaluate(func, simplex[1:])))
+        used = dim
+
+        def evaluate(point):
+            point = np.clip(point, lower, upper)
+            return point, self._polish_evaluate(func, point.reshape(1, dim))[0]
+
+        # an iteration evaluates at most dim + 1 points (shrink)
+        while self._polish_allows(used, dim + 1):
+            order = np.argsort(costs, kind='mergesort')
+            simplex = simplex[order]
+            costs = costs[order]
+            if ((simplex.max(axis=0) - simplex.min(axis=0)) <= min_step).all():
+                break
+
+            centroid = simplex[:-1].mean(axis=0)
+            reflected, reflected_cost = evaluate(2*centroid - simplex[-1])
+            used += 1
+            if reflected_cost < costs[0]:
+                expanded, expanded_cost = evaluate(3*centroid - 2*simplex[-1])
+                used += 1
+                if expanded_cost < reflected_cost:
+                    simplex[-1], costs[-1] = expanded, expanded_cost
+                else:
+                    simplex[-1], costs[-1] = reflected, reflected_cost
+            elif reflected_cost < costs[-2]:
+                simplex[-1], costs[-1] = reflected, reflected_cost
+            else:
+                # contract towards the better of reflected and worst
+                if reflected_cost < costs[-1]:
+                    worse = reflected_cost
+                    contracted = evaluate(0.5*(centroid + reflected))
+                else:
+                    worse = costs[-1]
+                    contracted = evaluate(0.5*(centroid + simplex[-1]))
+                used += 1
+                if contracted[1] < worse:
+                    simplex[-1], costs[-1] = contracted
+                else:
+                    simplex[1:] = 0.5*(simplex[0] + simplex[1:])
+                    costs[1:] = self._polish_evaluate(func, simplex[1:])
+                    used += dim
+
+        best = costs.argmin()
+        return simplex[best], costs[best]
+
+    def _end_generation(self):
+        """
+        Counts finished generation and calls generation hooks with self.
+        Hooks may change population _x and _cost in place, or end the run
+        by setting stop_reason to 'cancelled'. Calls observer every
+        observer_interval generations.
+        """
+        self.generations += 1
+        for hook in self._generation_hooks:
+            hook(self)
+
+        if (self.observer is not None and
+                self.generations % self.observer_interval == 0 and
+                self.observer(self._run_stats())):
+            self.stop_reason = 'cancelled'
+
+        if (self._checkpointer is not None and 
+                self.generations % self.checkpoint_interval == 0):
+            self._checkpointer.save(self)
+
+    def _evaluate(self, func, x):
+        """
+        Returns costs of all rows of x (2d numpy) with one batch call.
+        """
+        self.evaluations += len(x)
+        return func.batch(x)
 
     def _unique_indexes(self, idx, bound):
         """
@@ -116,6 +741,32 @@ class DifferentialEvolutionSP(_DifferentialEvolution):
             c = rnd.randint(0, bound)
         return a, b, c
 
+    def _unique_index_matrix(self, bound, count):
+        """
+        Returns (bound, count) integer array of random indexes in [0,bound)
+        where all indexes in row idx are unique and different than idx.
+        """
+        return self._unique_index_stack(1, bound, count)[0]
+
+    def _unique_index_stack(self, problems, bound, count):
+        """
+        Returns (problems, bound, count) integer array, problems independent
+        matrices of _unique_index_matrix. Each column is drawn without
+        rejection, by shifting a random integer over the indexes that are
+        already taken in its row.
+        """
+        if bound <= count:
+            raise ValueError('pop_size must be greater than %d' % count)
+
+        taken = np.tile(np.arange(bound).reshape(1, bound, 1), 
+                        (problems, 1, 1))
+        for k in range(count):
+            idx = rnd.randint(0, bound - k - 1, (problems, bound))
+            for col in np.rollaxis(np.sort(taken, axis=2), 2):
+                idx += idx >= col
+            taken = np.concatenate((taken, idx[:, :, np.newaxis]), axis=2)
+        return taken[:, :, 1:]
+
 
 if __name__ == "__main__":
     import doctest
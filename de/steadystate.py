@@ -0,0 +1,268 @@
+import multiprocessing as mp
+import time
+import traceback
+import numpy as np
+import numpy.random as rnd
+
+from function import Function
+from singleprocess import DifferentialEvolutionSP
+
+
+class DifferentialEvolutionAS(DifferentialEvolutionSP):
+    """
+    Differential Evolution algorithm - asynchronous steady-state
+    implementation with a pool of worker processes.
+
+    There is no generation barrier. The master process keeps every worker
+    busy with trial vectors, and as soon as a trial is evaluated it
+    replaces its target individual if it is not worse, and a new trial is
+    sent. Trials are built from the current population, so improvements
+    are used immediately. Suitable for functions with uneven evaluation
+    time. Every pop_size evaluations count as one generation for max_gen,
+    stopping criteria and generation hooks. No trial is sent beyond the
+    max_gen or max_evals budget. Trials in flight when another criterion
+    stops the run are still counted in evaluations and may replace their
+    targets.
+
+    Public members initialized in constructor:
+    pop_size   -- population size, integer constant greater than zero
+                  (recomended at least 10x number of function parameters)
+    max_gen    -- maximum generations, integer constant greater than zero
+                  (recomended at least 1000)
+    cr         -- crossover constant, float in [0,1]
+    f          -- factor of differential amplification, float in [0,2]
+    proc_count -- number of worker processes, integer greater or equal to
+                  zero, if zero then multiprocessing.cpu_count() is used
+    backlog    -- number of trials sent to a worker ahead, integer greater
+                  than zero, so a worker never waits for the master
+
+    Keyword arguments polishing (polish, polish_method and polish_evals),
+    stopping criteria (target_cost, cost_tol, x_tol, stagnation, max_evals
+    and max_time), checkpointing (checkpoint and checkpoint_interval) and
+    instrumentation (observer and observer_interval) are public members
+    described in _DifferentialEvolution. Trials are built one at a time by 'rand/1'
+    strategy with 'bin' crossover and constant f and cr, other strategies,
+    adaptation and min_pop_size can't be used. Polishing runs only at the
+    end of the run, polish_interval must be zero. find_min_many raises
+    ValueError.
+
+    Example:
+    >>> def func(x):
+    ...     return 100*(x[0]**2 - x[1])**2 + (1 - x[0])**2
+    >>>
+    >>> saddle = Function(func, dim=2, lower=(-2.048,)*2, upper=(2.048,)*2)
+    >>> de = DifferentialEvolutionAS(pop_size=40, max_gen=1000, cr=0.9, f=0.9,
+    ...                              proc_count=2)
+    >>> minimum, min_point = de.find_min(saddle)
+    >>>
+    >>> print "Min: f", tuple(min_point), "=", minimum
+    Min: f (1.0, 1.0) = 0.0
+    """
+
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5,
+                 proc_count=1, backlog=2, **kwargs):
+
+        super(DifferentialEvolutionAS, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
+
+        if not proc_count >= 0:
+            raise ValueError('proc_count must be integer >= 0')
+
+        if not backlog > 0:
+            raise ValueError('backlog must be integer greater than zero')
+
+        if (self.strategy, self.crossover) != ('rand/1', 'bin'):
+            raise ValueError('asynchronous steady-state requires rand/1 '
+                             'strategy with bin crossover')
+
+        if self.adaptation or self.min_pop_size:
+            raise ValueError('asynchronous steady-state requires '
+                             'adaptation=None and min_pop_size=0')
+
+        if self.polish_interval:
+            raise ValueError('asynchronous steady-state polishes only at '
+                             'the end, polish_interval must be zero')
+
+        if proc_count == 0:
+            self.proc_count = mp.cpu_count()
+        else:
+            self.proc_count = proc_count
+        self.backlog = backlog
+
+    def find_min(self, func):
+        """
+        Returns tuple consisting of:
+        - function minimum
+        - point where function has a minimum (numpy array)
+        Sets stop_reason, generations and evaluations.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError, RuntimeError
+        """
+        return self._run_workers(
+            super(DifferentialEvolutionAS, self).find_min, func)
+
+    def resume(self, func):
+        """
+        Continues the run saved in checkpoint directory, see
+        DifferentialEvolutionSP.resume.
+
+        Exceptions:
+            TypeError, ValueError, IOError, RuntimeError
+        """
+        return self._run_workers(
+            super(DifferentialEvolutionAS, self).resume, func)
+
+    def find_min_many(self, funcs):
+        """
+        Not supported, find_min_many evaluates every problem in the
+        calling process, worker processes would be ignored.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('asynchronous steady-state does not support find_min_many')
+
+    def _run_workers(self, run, func):
+        """
+        Returns run(func) called with worker processes started.
+        """
+        self._check_func(func)
+
+        # workers inherit func, only points and costs are pickled
+        self._tasks = mp.Queue()
+        self._results = mp.Queue()
+        proc_group = []
+        for i in range(self.proc_count):
+            proc = mp.Process(target=self._serve, args=(func,))
+            proc.daemon = True
+            proc.start()
+            proc_group.append(proc)
+
+        try:
+            return run(func)
+        finally:
+            for proc in proc_group:
+                self._tasks.put(None)
+            for proc in proc_group:
+                proc.join()
+
+    def _run_generations(self, func):
+        """
+        Implementation of asynchronous steady-state DE algorithm, runs
+        the initialized population until a stopping criterion is met.
+        """
+        n = self.pop_size
+        lower = np.array(func.lower, dtype=float)
+        upper = np.array(func.upper, dtype=float)
+
+        # trials in flight must fit the budget, workers evaluate them even
+        # after the run stops
+        budget = n*(self.max_gen + 1)
+        if self.max_evals:
+            budget = min(budget, self.max_evals)
+
+        # keep every worker busy, targets go round robin
+        sent = {}
+        task = 0
+        target = 0
+        done = 0
+        stop = self._check_stop(self._x, self._cost)
+        while not stop or sent:
+            while (not stop and len(sent) < self.proc_count*self.backlog and
+                   self.evaluations + len(sent) < budget):
+                sent[task] = target, self._trial(target, lower, upper)
+                self._tasks.put((task, sent[task][1]))
+                task += 1
+                target = (target + 1) % n
+
+            start = time.time()
+            key, score = self._receive()
+            self._eval_time += time.time() - start
+            i, trial = sent.pop(key)
+
+            self.evaluations += 1
+            if score <= self._cost[i]:
+                self._x[i] = trial
+                self._cost[i] = score
+            if stop:
+                continue
+
+            done += 1
+            if done == n:
+                done = 0
+                self._end_generation()
+                stop = self._check_stop(self._x, self._cost)
+
+    def _trial(self, i, lower, upper):
+        """
+        Returns trial vector for target individual i of the current
+        population, DE/rand/1/bin with random replacement of out of bounds
+        elements.
+        """
+        dim = len(lower)
+        a, b, c = self._unique_indexes(i, self.pop_size)
+        mutant = self._x[c] + self.f*(self._x[a] - self._x[b])
+
+        cross = rnd.rand(dim) < self.cr
+        cross[rnd.randint(0, dim)] = True
+        trial = np.where(cross, mutant, self._x[i])
+
+        out = np.nonzero((trial < lower) | (trial > upper))[0]
+        trial[out] = rnd.rand(len(out))*(upper - lower)[out] + lower[out]
+        return trial
+
+    def _evaluate(self, func, x):
+        """
+        Returns costs of all rows of x (2d numpy), evaluated by workers
+        one row per task.
+
+        Exceptions:
+            RuntimeError
+        """
+        self.evaluations += len(x)
+        for i in range(len(x)):
+            self._tasks.put((i, x[i]))
+
+        cost = np.empty(len(x))
+        for k in range(len(x)):
+            i, score = self._receive()
+            cost[i] = score
+        return cost
+
+    def _receive(self):
+        """
+        Returns key and cost of the next task evaluated by workers.
+
+        Exceptions:
+            RuntimeError
+        """
+        key, score, error = self._results.get()
+        if error is not None:
+            raise RuntimeError('worker process failed:\n' + error)
+        return key, score
+
+    def _serve(self, func):
+        """
+        Worker process loop, evaluates points of (key, point) tasks until
+        it gets None. Puts (key, cost, None) to _results queue, or
+        (key, None, traceback string) on error.
+        """
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            key, point = task
+            try:
+                self._results.put((key, func(point), None))
+            except Exception:
+                self._results.put((key, None, traceback.format_exc()))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
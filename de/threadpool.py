@@ -0,0 +1,136 @@
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+import numpy as np
+
+from function import Function
+from singleprocess import DifferentialEvolutionSP
+
+
+class DifferentialEvolutionTP(DifferentialEvolutionSP):
+    """
+    Differential Evolution algorithm - thread pool implementation.
+
+    The calling thread holds the whole population and runs the vectorized
+    DE algorithm of DifferentialEvolutionSP. Each batch of points (initial
+    population, trials of a generation) is split into thread_count chunks,
+    evaluated concurrently by a pool of threads of the same process.
+    Nothing is forked, pickled or copied to shared memory, so the pool
+    starts almost instantly. Suited for functions that release the GIL
+    (NumPy, BLAS or C extensions), other functions gain nothing from
+    threads. For the same numpy.random seed the result is identical to
+    DifferentialEvolutionSP.
+
+    Public members initialized in constructor:
+    pop_size     -- population size, integer constant greater than zero
+                    (recomended at least 10x number of function parameters)
+    max_gen      -- maximum generations, integer constant greater than zero
+                    (recomended at least 1000)
+    cr           -- crossover constant, float in [0,1]
+    f            -- factor of differential amplification, float in [0,2]
+    thread_count -- number of threads, integer greater or equal to zero,
+                    if zero then multiprocessing.cpu_count() is used
+
+    Keyword arguments are public members described in
+    _DifferentialEvolution and DifferentialEvolutionSP. The reference loop
+    (vectorized=False) can't be used, it evaluates one trial at a time,
+    find_min_many raises ValueError.
+    Function must be safe to call from many threads at once, so its cache
+    must be disabled (cache_size=0).
+
+    Example:
+    >>> def func(x):
+    ...     return 100*(x[:,0]**2 - x[:,1])**2 + (1 - x[:,0])**2
+    >>>
+    >>> saddle = Function(func, dim=2, lower=(-2.048,)*2, upper=(2.048,)*2,
+    ...                   vectorized=True)
+    >>> de = DifferentialEvolutionTP(pop_size=40, max_gen=1000, cr=0.9, f=0.9,
+    ...                              thread_count=2)
+    >>> minimum, min_point = de.find_min(saddle)
+    >>>
+    >>> print "Min: f", tuple(min_point), "=", minimum
+    Min: f (1.0, 1.0) = 0.0
+    """
+
+    def __init__(self, pop_size=20, max_gen=1000, cr=0.9, f=0.5,
+                 thread_count=0, **kwargs):
+
+        super(DifferentialEvolutionTP, self).__init__(pop_size, max_gen, cr, f,
+                                                      **kwargs)
+
+        if not self.vectorized:
+            raise ValueError('thread pool requires vectorized=True')
+
+        if not thread_count >= 0:
+            raise ValueError('thread_count must be integer >= 0')
+
+        if thread_count == 0:
+            self.thread_count = mp.cpu_count()
+        else:
+            self.thread_count = thread_count
+
+    def find_min(self, func):
+        """
+        Returns tuple consisting of:
+        - function minimum
+        - point where function has a minimum (numpy array)
+        Sets stop_reason, generations and evaluations.
+
+        Arguments:
+        func -- function to be minimized, instance of Function
+
+        Exceptions:
+            TypeError, ValueError, exceptions raised by func
+        """
+        return self._run_pool(super(DifferentialEvolutionTP, self).find_min,
+                              func)
+
+    def resume(self, func):
+        """
+        Continues the run saved in checkpoint directory, see
+        DifferentialEvolutionSP.resume.
+
+        Exceptions:
+            TypeError, ValueError, IOError, exceptions raised by func
+        """
+        return self._run_pool(super(DifferentialEvolutionTP, self).resume,
+                              func)
+
+    def find_min_many(self, funcs):
+        """
+        Not supported, find_min_many evaluates every problem in the
+        calling thread, pool threads would be ignored.
+
+        Exceptions:
+            ValueError
+        """
+        raise ValueError('thread pool does not support find_min_many')
+
+    def _run_pool(self, run, func):
+        """
+        Returns run(func) called with the thread pool started.
+        """
+        self._check_func(func)
+        if func.cache_size:
+            raise ValueError('thread pool requires Function with '
+                             'cache_size=0')
+
+        self._pool = ThreadPool(self.thread_count)
+        try:
+            return run(func)
+        finally:
+            self._pool.terminate()
+            self._pool = None
+
+    def _evaluate(self, func, x):
+        """
+        Returns costs of all rows of x (2d numpy), chunks of rows are
+        evaluated by pool threads.
+        """
+        self.evaluations += len(x)
+        chunks = np.array_split(x, min(self.thread_count, len(x)))
+        return np.concatenate(self._pool.map(func.batch, chunks))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,255 @@
+"""
+Benchmark of Differential Evolution backends on scalable test functions.
+
+Sweeps functions, dimensions, population sizes, backends and process
+counts. Every run is done in a forked process, so the peak memory of one
+run doesn't hide the others. One record per run is written as CSV or
+JSON lines with fields:
+
+function, dim, pop_size, backend, proc_count, repeat -- configuration
+seed            -- numpy.random seed of the run, --seed plus repeat
+wall_time       -- seconds of find_min
+evaluations     -- number of function evaluations
+evals_per_sec   -- evaluations/wall_time
+minimum         -- minimum found
+stop_reason     -- criterion that ended the run
+time_to_target  -- wall_time if the run reached target, empty otherwise
+efficiency      -- evals_per_sec/(evals_per_sec of sp)/proc_count, empty
+                   without a sp run of the same function, dim and pop_size
+peak_rss_kb     -- peak resident memory of the run process and of its
+                   largest child process, KB
+
+Backends:
+sp   -- DifferentialEvolutionSP
+mp   -- DifferentialEvolutionMP
+pool -- DifferentialEvolutionPool
+mw   -- DifferentialEvolutionMW
+as   -- DifferentialEvolutionAS
+cc   -- DifferentialEvolutionCC with default groups, single process
+tp   -- DifferentialEvolutionTP with proc_count threads
+dist -- DifferentialEvolutionFarm with proc_count DEWorker processes on
+        localhost (requires pyzmq)
+
+Example:
+    $ python benchmark.py --functions sphere,rastrigin --dims 10,30 \\
+          --backends sp,mp,mw --procs 2,4 --format json > bench.json
+"""
+import csv
+import json
+import multiprocessing as mp
+import optparse
+import resource
+import sys
+import time
+import traceback
+import numpy.random as rnd
+
+import de
+import test_functions as fn
+
+
+FIELDS = ('function', 'dim', 'pop_size', 'backend', 'proc_count', 'repeat',
+          'seed', 'wall_time', 'evaluations', 'evals_per_sec', 'minimum',
+          'stop_reason', 'time_to_target', 'efficiency', 'peak_rss_kb')
+
+BACKENDS = {'mp': de.DifferentialEvolutionMP,
+            'pool': de.DifferentialEvolutionPool,
+            'mw': de.DifferentialEvolutionMW,
+            'as': de.DifferentialEvolutionAS,
+            'tp': lambda proc_count, **param:
+                  de.DifferentialEvolutionTP(thread_count=proc_count, **param)}
+
+
+def run_local(func, backend, pop_size, proc_count, options):
+    """
+    Runs find_min of a local backend and returns the algorithm and
+    the minimum.
+    """
+    param = dict(pop_size=pop_size, max_gen=options.max_gen, cr=options.cr,
+                 f=options.f, target_cost=options.target)
+    if backend == 'sp':
+        algo = de.DifferentialEvolutionSP(**param)
+    elif backend == 'cc':
+        algo = de.DifferentialEvolutionCC(**param)
+    else:
+        algo = BACKENDS[backend](proc_count=proc_count, **param)
+    minimum, min_point = algo.find_min(func)
+    if backend == 'pool':
+        algo.close()
+    return algo, minimum
+
+
+def run_distributed(func, pop_size, proc_count, options):
+    """
+    Runs find_min of DifferentialEvolutionFarm with proc_count workers on
+    localhost and returns the algorithm and the minimum.
+    """
+    from de.distributed.worker import DEWorker
+    from de.distributed.manager import DEManager
+    from de.distributed.farm import DifferentialEvolutionFarm
+
+    # forked workers find the function under this name in test_functions
+    fn.benchmark_function = func
+    port = options.port
+    work_ports = dict(send=str(port + 1), receive=str(port),
+                      control=str(port + 2))
+    mgr_ports = dict(send=str(port), receive=str(port + 1),
+                     control=str(port + 2))
+
+    worker = DEWorker('127.0.0.1', work_ports, prefetch=2)
+    for i in range(proc_count):
+        mp.Process(target=start_worker, args=(worker, i)).start()
+    manager = DEManager(mgr_ports, 1)
+
+    batch_size = -(-pop_size//proc_count)
+    algo = DifferentialEvolutionFarm(manager, 'test_functions',
+                                     'benchmark_function', pop_size,
+                                     options.max_gen, options.cr, options.f,
+                                     batch_size=batch_size,
+                                     target_cost=options.target)
+    try:
+        minimum, min_point = algo.find_min(func)
+    finally:
+        manager.stop()
+    return algo, minimum
+
+
+def start_worker(worker, i):
+    """
+    Starts DEWorker i with its messages on stderr, stdout holds records.
+    """
+    sys.stdout = sys.stderr
+    worker.start(i)
+
+
+def measure(config, options, queue):
+    """
+    Runs one configuration and puts its record to queue, or dictionary
+    with key error holding the traceback, runs in a forked process.
+    """
+    # forked processes inherit the random state, every run is seeded
+    rnd.seed(config['seed'])
+    func = fn.scalable(config['function'], config['dim'])
+    start = time.time()
+    try:
+        if config['backend'] == 'dist':
+            algo, minimum = run_distributed(func, config['pop_size'],
+                                            config['proc_count'], options)
+        else:
+            algo, minimum = run_local(func, config['backend'],
+                                      config['pop_size'],
+                                      config['proc_count'], options)
+    except Exception:
+        queue.put(dict(error=traceback.format_exc()))
+        return
+    wall_time = time.time() - start
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    record = dict(config, wall_time=wall_time,
+                  evaluations=algo.evaluations,
+                  evals_per_sec=algo.evaluations/wall_time,
+                  minimum=float(minimum), stop_reason=algo.stop_reason,
+                  time_to_target=None, efficiency=None, peak_rss_kb=peak)
+    if algo.stop_reason == 'target_cost':
+        record['time_to_target'] = wall_time
+    queue.put(record)
+
+
+def configurations(options):
+    """
+    Yields configurations of the sweep, sp runs first in every group of
+    function, dim and pop_size.
+    """
+    backends = sorted(options.backends, key=lambda name: name != 'sp')
+    for name in options.functions:
+        for dim in options.dims:
+            for pop_size in options.pop_sizes:
+                for backend in backends:
+                    procs = [1] if backend in ('sp', 'cc') else options.procs
+                    for proc_count in procs:
+                        for repeat in range(options.repeat):
+                            yield dict(function=name, dim=dim,
+                                       pop_size=pop_size, backend=backend,
+                                       proc_count=proc_count,
+                                       repeat=repeat,
+                                       seed=options.seed + repeat)
+
+
+def benchmark(options, out):
+    """
+    Runs the sweep and writes records to out as they complete.
+    """
+    if options.format == 'csv':
+        writer = csv.DictWriter(out, FIELDS)
+        writer.writeheader()
+        out.flush()
+
+    baseline = {}
+    for config in configurations(options):
+        queue = mp.Queue()
+        proc = mp.Process(target=measure, args=(config, options, queue))
+        proc.start()
+        record = queue.get()
+        proc.join()
+        if 'error' in record:
+            sys.stderr.write('%r failed:\n%s' % (config, record['error']))
+            continue
+
+        group = (config['function'], config['dim'], config['pop_size'])
+        if config['backend'] == 'sp':
+            baseline.setdefault(group, []).append(record['evals_per_sec'])
+        elif group in baseline:
+            sp_rate = sum(baseline[group])/len(baseline[group])
+            record['efficiency'] = (record['evals_per_sec']/sp_rate/
+                                    config['proc_count'])
+
+        if options.format == 'csv':
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record) + '\n')
+        out.flush()
+
+
+def parse_args(argv):
+    def ints(text):
+        return [int(item) for item in text.split(',')]
+
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--functions', default='sphere,rastrigin',
+                      help='comma separated names of %s' %
+                      ', '.join(sorted(fn.scalable_functions)))
+    parser.add_option('--dims', default='10,30')
+    parser.add_option('--pop-sizes', default='50')
+    parser.add_option('--backends', default='sp,mp,mw',
+                      help='comma separated sp, mp, pool, mw, as, cc, tp, dist')
+    parser.add_option('--procs', default='2,4')
+    parser.add_option('--repeat', type='int', default=1)
+    parser.add_option('--seed', type='int', default=0,
+                      help='numpy.random seed of the first repeat')
+    parser.add_option('--max-gen', type='int', default=200)
+    parser.add_option('--cr', type='float', default=0.9)
+    parser.add_option('--f', type='float', default=0.5)
+    parser.add_option('--target', type='float', default=1e-6,
+                      help='cost of time_to_target, the run stops there')
+    parser.add_option('--port', type='int', default=5657,
+                      help='first of three ports of the dist backend')
+    parser.add_option('--format', choices=('csv', 'json'), default='csv')
+    options, args = parser.parse_args(argv)
+
+    options.functions = options.functions.split(',')
+    options.backends = options.backends.split(',')
+    options.dims = ints(options.dims)
+    options.pop_sizes = ints(options.pop_sizes)
+    options.procs = ints(options.procs)
+    for name in options.functions:
+        if name not in fn.scalable_functions:
+            parser.error('unknown function ' + name)
+    for name in options.backends:
+        if name not in ('sp', 'cc', 'dist') and name not in BACKENDS:
+            parser.error('unknown backend ' + name)
+    return options
+
+
+if __name__ == "__main__":
+    benchmark(parse_args(sys.argv[1:]), sys.stdout)
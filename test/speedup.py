@@ -10,7 +10,7 @@ cr = 0.9
 f = 0.5
 cpu = 8
 
-sp = de.DifferentialEvolution(pop_size, max_gen, cr, f)
+sp = de.DifferentialEvolutionSP(pop_size, max_gen, cr, f)
 mp = de.DifferentialEvolutionMP(pop_size, max_gen, cr, f, cpu)
 """
 t_sp = timeit.Timer("sp.find_min(fn.saddle)", setup)
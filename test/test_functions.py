@@ -34,6 +34,15 @@ def func1(x):
 sphere = de.Function(func1, 2, (-5.12, -5.12), (5.12, 5.12))
 sphere_result = FunctionResult(0., (0., 0.), 7, (-eps, -eps), (eps, eps))
 
+def func1v(x):
+    """
+    Function 1 - Sphere, vectorized over rows of x
+    """
+    return (x**2).sum(axis=1)
+
+sphere_vec = de.Function(func1v, 2, (-5.12, -5.12), (5.12, 5.12), 
+                         vectorized=True)
+
 def func2(x):
     """
     Function 2 - Rosenbrock's saddle (second De Jong function)
@@ -73,3 +82,41 @@ def func4(x):
 
 griewangk = de.Function(func4, 9, (-400,)*9, (400,)*9)
 griewangk_result = FunctionResult(0., (0.,)*9, 7, (-eps,)*9, (eps,)*9)
+
+def func5(x):
+    """
+    Function 5 - Rastrigin's function, vectorized over rows of x
+    Any number of parameters in range [-5.12, 5.12]
+    The minimum is f(0,..,0) = 0
+    """
+    return 10*x.shape[1] + (x**2 - 10*numpy.cos(2*math.pi*x)).sum(axis=1)
+
+def func6(x):
+    """
+    Function 6 - Rosenbrock's function, vectorized over rows of x
+    Any number of parameters in range [-2.048, 2.048]
+    The minimum is f(1,..,1) = 0
+    """
+    return (100*(x[:,1:] - x[:,:-1]**2)**2 + (1 - x[:,:-1])**2).sum(axis=1)
+
+def func7(x):
+    """
+    Function 7 - Griewangk's function, vectorized over rows of x
+    Any number of parameters in range [-600, 600]
+    The minimum is f(0,..,0) = 0
+    """
+    j = numpy.arange(1, x.shape[1] + 1)
+    return (x**2).sum(axis=1)/4000 - numpy.cos(x/numpy.sqrt(j)).prod(axis=1) + 1
+
+# scalable functions: name -> (vectorized function, bound)
+scalable_functions = dict(sphere=(func1v, 5.12), rastrigin=(func5, 5.12),
+                          rosenbrock=(func6, 2.048), griewangk=(func7, 600.))
+
+def scalable(name, dim):
+    """
+    Returns vectorized Function of dim parameters, name is a key of
+    scalable_functions. The minimum is 0.
+    """
+    func, bound = scalable_functions[name]
+    return de.Function(func, dim, (-bound,)*dim, (bound,)*dim, 
+                       vectorized=True)
@@ -0,0 +1,127 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+
+import de
+import test_functions as fn
+
+
+class TestDifferentialEvolutionAS(unittest.TestCase):
+
+    def assertResult(self, minimum, point, func_res):
+        """
+        Check if minimum has accuracy to the desired decimal places 
+        Check if mimimum point is within the accuracy bounds
+        """
+        self.assertAlmostEqual(minimum, func_res.minimum, func_res.places)
+        for i in range(len(point)):
+            self.assertGreater(point[i], func_res.lower[i])
+            self.assertLess(point[i], func_res.upper[i])
+
+    def testSphere(self):
+        diffevol = de.DifferentialEvolutionAS(pop_size=20, f=0.9, cr=0.1,
+                                              proc_count = 2, 
+                                              target_cost=1e-12)
+        minimum, point = diffevol.find_min(fn.sphere)
+        self.assertResult(minimum, point, fn.sphere_result)
+        self.assertEqual(diffevol.stop_reason, 'target_cost')
+
+    def testSaddle(self):
+        diffevol = de.DifferentialEvolutionAS(pop_size=40, f=0.9, cr=0.9,
+                                              proc_count = 3)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+        self.assertEqual(diffevol.generations, diffevol.max_gen)
+        self.assertEqual(diffevol.evaluations, 40*1001)
+
+    def testMaxEvals(self):
+        # worker processes count real calls of func in shared memory
+        calls = multiprocessing.Value('l', 0)
+        def func(x):
+            with calls.get_lock():
+                calls.value += 1
+            return fn.func1(x)
+        sphere = de.Function(func, 2, (-5.12,)*2, (5.12,)*2)
+
+        diffevol = de.DifferentialEvolutionAS(pop_size=20, proc_count = 2, 
+                                              backlog=4, max_evals=510)
+        diffevol.find_min(sphere)
+        self.assertEqual(diffevol.stop_reason, 'max_evals')
+        self.assertLessEqual(diffevol.evaluations, 510)
+        self.assertEqual(diffevol.evaluations, calls.value)
+
+        calls.value = 0
+        diffevol.max_evals = 500
+        diffevol.find_min(sphere)
+        self.assertEqual(diffevol.evaluations, 500)
+        self.assertEqual(calls.value, 500)
+
+        calls.value = 0
+        diffevol = de.DifferentialEvolutionAS(pop_size=20, proc_count = 2, 
+                                              backlog=4, max_gen=10)
+        diffevol.find_min(sphere)
+        self.assertEqual(diffevol.evaluations, 220)
+        self.assertEqual(calls.value, 220)
+
+        # trials in flight at target_cost are drained and counted
+        calls.value = 0
+        diffevol = de.DifferentialEvolutionAS(pop_size=20, proc_count = 2, 
+                                              backlog=4, target_cost=1e-3)
+        diffevol.find_min(sphere)
+        self.assertEqual(diffevol.stop_reason, 'target_cost')
+        self.assertEqual(diffevol.evaluations, calls.value)
+
+    def testPolish(self):
+        diffevol = de.DifferentialEvolutionAS(pop_size=40, max_gen=30,
+                                              f=0.9, cr=0.9, proc_count = 2,
+                                              polish=1)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+        self.assertRaises(ValueError, de.DifferentialEvolutionAS, polish=1,
+                          polish_interval=10)
+
+    def testCheckpointResume(self):
+        path = tempfile.mkdtemp()
+        try:
+            first = de.DifferentialEvolutionAS(pop_size=20, max_gen=20,
+                                               f=0.9, cr=0.9, proc_count = 2,
+                                               checkpoint=path)
+            first.find_min(fn.saddle)
+
+            second = de.DifferentialEvolutionAS(pop_size=20, max_gen=40,
+                                                f=0.9, cr=0.9, proc_count = 2,
+                                                checkpoint=path)
+            second.resume(fn.saddle)
+            self.assertEqual(second.generations, 40)
+            self.assertEqual(second.evaluations, 20*41)
+
+            # the instance of the finished run starts its workers again
+            first.max_gen = 60
+            first.resume(fn.saddle)
+            self.assertEqual(first.generations, 60)
+            self.assertEqual(first.evaluations, 20*61)
+        finally:
+            shutil.rmtree(path)
+
+    def testStrategyRejected(self):
+        self.assertRaises(ValueError, de.DifferentialEvolutionAS, 
+                          strategy='best/1')
+        self.assertRaises(ValueError, de.DifferentialEvolutionAS, 
+                          crossover='exp')
+        self.assertRaises(ValueError, de.DifferentialEvolutionAS, 
+                          adaptation='jde')
+        self.assertRaises(ValueError, de.DifferentialEvolutionAS, 
+                          min_pop_size=10)
+        self.assertRaises(ValueError, 
+                          de.DifferentialEvolutionAS().find_min_many, 
+                          [fn.saddle]*2)
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestDifferentialEvolutionAS))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
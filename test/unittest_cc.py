@@ -0,0 +1,89 @@
+import unittest
+import numpy
+
+import de
+import test_functions as fn
+
+
+class TestDifferentialEvolutionCC(unittest.TestCase):
+
+    def assertResult(self, minimum, point, func_res):
+        """
+        Check if minimum has accuracy to the desired decimal places 
+        Check if mimimum point is within the accuracy bounds
+        """
+        self.assertAlmostEqual(minimum, func_res.minimum, func_res.places)
+        for i in range(len(point)):
+            self.assertGreater(point[i], func_res.lower[i])
+            self.assertLess(point[i], func_res.upper[i])
+
+    def testSphere(self):
+        diffevol = de.DifferentialEvolutionCC(pop_size=20, f=0.9, cr=0.1,
+                                              group_size=1, group_gen=5)
+        minimum, point = diffevol.find_min(fn.sphere_vec)
+        self.assertResult(minimum, point, fn.sphere_result)
+
+    def testSaddle(self):
+        diffevol = de.DifferentialEvolutionCC(pop_size=40, f=0.9, cr=0.9,
+                                              max_gen=2000, group_size=2)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testLargeScale(self):
+        sphere = fn.scalable('sphere', 500)
+        numpy.random.seed(0)
+        plain = de.DifferentialEvolutionSP(pop_size=30, max_gen=10**6,
+                                           max_evals=60000)
+        plain_minimum, point = plain.find_min(sphere)
+
+        for dtype in ('float64', 'float32'):
+            numpy.random.seed(0)
+            diffevol = de.DifferentialEvolutionCC(pop_size=30, group_size=20,
+                                                  max_gen=10**6,
+                                                  max_evals=60000,
+                                                  dtype=dtype)
+            minimum, point = diffevol.find_min(sphere)
+            self.assertEqual(diffevol.stop_reason, 'max_evals')
+            self.assertLessEqual(diffevol.evaluations, 60000)
+            self.assertEqual(diffevol._x.dtype, numpy.dtype(dtype))
+            self.assertEqual(point.dtype, numpy.dtype(dtype))
+            self.assertLess(minimum, plain_minimum/5)
+            self.assertAlmostEqual(minimum, sphere(point), 2)
+
+    def testObserver(self):
+        reports = []
+        def observer(stats):
+            reports.append(stats['best_cost'])
+            return len(reports) == 5
+        diffevol = de.DifferentialEvolutionCC(pop_size=20, group_size=3,
+                                              observer=observer,
+                                              observer_interval=4)
+        diffevol.find_min(fn.scalable('rastrigin', 10))
+        self.assertEqual(diffevol.stop_reason, 'cancelled')
+        self.assertEqual(diffevol.generations, 20)
+        self.assertEqual(reports, sorted(reports, reverse=True))
+
+    def testRejected(self):
+        self.assertRaises(ValueError, de.DifferentialEvolutionCC, 
+                          group_size=0)
+        self.assertRaises(ValueError, de.DifferentialEvolutionCC, 
+                          dtype='float16')
+        self.assertRaises(ValueError, de.DifferentialEvolutionCC, 
+                          adaptation='jde')
+        self.assertRaises(ValueError, de.DifferentialEvolutionCC, 
+                          checkpoint='/tmp')
+
+        diffevol = de.DifferentialEvolutionCC(group_size=5)
+        self.assertRaises(ValueError, diffevol.find_min_many, 
+                          [fn.scalable('sphere', 10)]*2)
+        self.assertRaises(ValueError, diffevol.resume, 
+                          fn.scalable('sphere', 10))
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestDifferentialEvolutionCC))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,399 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy
+
+import de
+import test_functions as fn
+
+try:
+    import zmq
+    from de.distributed.transport import send_msg, recv_msg, decode_msg
+    from de.distributed.scheduler import Scheduler
+    from de.distributed.worker import DEWorker
+    from de.distributed.manager import DEManager
+    from de.distributed.farm import DifferentialEvolutionFarm
+except ImportError:
+    zmq = None
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.context = zmq.Context()
+        self.receiver = self.context.socket(zmq.PAIR)
+        self.receiver.bind('inproc://transport')
+        self.sender = self.context.socket(zmq.PAIR)
+        self.sender.connect('inproc://transport')
+
+    def tearDown(self):
+        self.context.destroy(linger=0)
+
+    def testRoundTrip(self):
+        x = numpy.arange(24.).reshape(4, 6)
+        arrays = dict(x = x,
+                      columns = x[:, ::2],
+                      transposed = x.T,
+                      ints = numpy.arange(5, dtype='>i4'),
+                      small = numpy.ones((2, 3), dtype=numpy.float32),
+                      flags = numpy.array([True, False]),
+                      scalar = numpy.array(2.5),
+                      empty = numpy.zeros((0, 3)))
+        send_msg(self.sender, dict(type = 'result', cost = [1.5, 2]), 
+                 arrays)
+        msg, received = recv_msg(self.receiver)
+
+        self.assertEqual(msg, dict(type = 'result', cost = [1.5, 2]))
+        self.assertEqual(sorted(received), sorted(arrays))
+        for name, a in arrays.items():
+            self.assertEqual(received[name].dtype, a.dtype)
+            self.assertEqual(received[name].shape, a.shape)
+            self.assertTrue((received[name] == a).all())
+
+    def testNoArrays(self):
+        for arrays in (None, {}):
+            send_msg(self.sender, dict(type = 'heartbeat'), arrays)
+            frames = self.receiver.recv_multipart(copy=False)
+            self.assertEqual(len(frames), 1)
+            self.assertEqual(decode_msg(frames), 
+                             (dict(type = 'heartbeat'), {}))
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestScheduler(unittest.TestCase):
+
+    ports = dict(send='5711', receive='5712', control='5713')
+
+    def setUp(self):
+        self.scheduler = Scheduler(self.ports, heartbeat_timeout=0.3)
+        self.context = zmq.Context()
+
+    def tearDown(self):
+        self.context.destroy(linger=0)
+        self.scheduler.close()
+
+    def worker(self, identity, credit):
+        """
+        Returns DEALER socket of a simulated worker registered with credit.
+        """
+        sock = self.context.socket(zmq.DEALER)
+        sock.setsockopt(zmq.IDENTITY, identity)
+        sock.connect('tcp://127.0.0.1:' + self.ports['send'])
+        send_msg(sock, dict(type = 'ready', credit = credit))
+        return sock
+
+    def receive_tasks(self, sock, count, beating=(), timeout=3.):
+        """
+        Polls the scheduler until sock receives count tasks, workers of
+        beating send heartbeats meanwhile. Returns task ids.
+        """
+        tasks = []
+        start = time.time()
+        while len(tasks) < count and time.time() - start < timeout:
+            for other in beating:
+                send_msg(other, dict(type = 'heartbeat'))
+            self.scheduler.poll(0.05)
+            while sock.poll(0):
+                tasks.append(recv_msg(sock)[0]['task'])
+        return tasks
+
+    def testSilentWorker(self):
+        silent = self.worker('silent', 1)
+        task_id = self.scheduler.submit(dict(x = 1))
+        self.assertEqual(self.receive_tasks(silent, 1), [task_id])
+
+        # the silent worker is dropped, its task goes to the live one
+        live = self.worker('live', 1)
+        self.assertEqual(self.receive_tasks(live, 1, [live]), [task_id])
+        self.assertNotIn('silent', self.scheduler._workers)
+
+        send_msg(live, dict(type = 'result', task = task_id, by = 'live'))
+        send_msg(silent, dict(type = 'result', task = task_id, 
+                              by = 'silent'))
+        results = list(self.scheduler.results(timeout=1.))
+        self.assertEqual([(task, msg['by']) for task, msg, arrays 
+                          in results], [(task_id, 'live')])
+
+        # the late copy is ignored, but returns the silent worker credit
+        self.scheduler.poll(0.2)
+        self.assertEqual(self.scheduler.outstanding(), 0)
+        self.assertEqual(list(self.scheduler.results(timeout=0.2)), [])
+        self.assertEqual(self.scheduler._ready.count('silent'), 1)
+
+    def testDroppedWorkerCredit(self):
+        worker = self.worker('idle', 2)
+        self.scheduler.poll(0.1)
+        self.assertEqual(self.scheduler._ready.count('idle'), 2)
+
+        start = time.time()
+        while 'idle' in self.scheduler._workers and \
+                time.time() - start < 3.:
+            self.scheduler.poll(0.05)
+        self.assertNotIn('idle', self.scheduler._workers)
+        self.assertNotIn('idle', self.scheduler._ready)
+
+        # alive after all, both credits come back
+        send_msg(worker, dict(type = 'heartbeat'))
+        task_ids = [self.scheduler.submit(dict(x = i)) for i in range(2)]
+        self.assertEqual(self.receive_tasks(worker, 2, [worker]), task_ids)
+
+
+def _marked_sphere(x):
+    """
+    Sphere function that marks the process evaluating it with a file in
+    directory DE_TEST_PIDS, named by its pid and holding its parent pid.
+    """
+    path = os.path.join(os.environ['DE_TEST_PIDS'], str(os.getpid()))
+    if not os.path.exists(path):
+        with open(path, 'w') as mark:
+            mark.write(str(os.getppid()))
+    return fn.func1(x)
+
+marked_sphere = de.Function(_marked_sphere, 2, (-5.12,)*2, (5.12,)*2)
+
+
+def _level_zero(x):
+    """
+    Constant 0, a call takes a millisecond, so islands of concurrent runs
+    overlap.
+    """
+    time.sleep(0.001)
+    return 0.
+
+def _level_one(x):
+    """
+    Constant 1, a call takes a millisecond.
+    """
+    time.sleep(0.001)
+    return 1.
+
+level_zero = de.Function(_level_zero, 2, (-1.,)*2, (1.,)*2)
+level_one = de.Function(_level_one, 2, (-1.,)*2, (1.,)*2)
+
+
+class _WorkersTestCase(unittest.TestCase):
+    """
+    Starts work_count local DEWorker processes and DEManager for each test.
+    """
+
+    ports = dict(send='5721', receive='5722', control='5723')
+    work_count = 2
+    prefetch = 2
+
+    def setUp(self):
+        work_ports = dict(send=self.ports['receive'], 
+                          receive=self.ports['send'],
+                          control=self.ports['control'])
+        worker = DEWorker('127.0.0.1', work_ports, prefetch=self.prefetch)
+        self.proc_group = [multiprocessing.Process(target=worker.start, 
+                                                   args=(i,))
+                           for i in range(self.work_count)]
+        for proc in self.proc_group:
+            proc.start()
+        self.manager = DEManager(self.ports, self.work_count)
+
+    def tearDown(self):
+        self.manager.stop()
+        for proc in self.proc_group:
+            proc.join(5)
+            if proc.is_alive():
+                proc.terminate()
+
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestManager(_WorkersTestCase):
+
+    def job(self, seed, **de_param):
+        de_param.setdefault('pop_size', 20)
+        de_param.setdefault('max_gen', 50)
+        de_param.setdefault('proc_count', 1)
+        return dict(func_module='test_functions', func_name='saddle',
+                    seed=seed, de_param=de_param)
+
+    def testJobs(self):
+        jobs = dict((('run', seed), self.job(seed)) for seed in range(5))
+        job_ids = []
+        for job_id, result in self.manager.iter_jobs(jobs):
+            job_ids.append(job_id)
+            self.assertNotIn('error', result)
+            self.assertEqual(result['stop_reason'], 'max_gen')
+            self.assertEqual(result['min_point'].shape, (2,))
+        self.assertEqual(sorted(job_ids), sorted(jobs))
+
+        # a sequence of jobs gets indexes as ids, failed jobs report errors
+        results = self.manager.run_jobs([self.job(1), 
+                                         self.job(2, pop_size=-1)])
+        self.assertEqual(sorted(results), [0, 1])
+        self.assertIn('minimum', results[0])
+        self.assertIn('ValueError', results[1]['error'])
+        self.assertRaises(ValueError, self.manager.run_jobs, 
+                          [dict(func_module='test_functions')])
+
+    def testFindMin(self):
+        de_param = dict(pop_size=20, max_gen=300, f=0.9, cr=0.9, 
+                        proc_count=2)
+        minimum, point = self.manager.find_min(
+            'test_functions', 'saddle', de_param, 
+            migration=dict(interval=10, migrants=2))
+        self.assertAlmostEqual(minimum, fn.saddle_result.minimum, 
+                               fn.saddle_result.places)
+        self.assertEqual(point.shape, (2,))
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestMigration(_WorkersTestCase):
+
+    # every job runs on its own worker, all at once
+    work_count = 3
+    prefetch = 1
+
+    def job(self, func_name, tag, max_gen):
+        return dict(func_module='unittest_dist', func_name=func_name, 
+                    tag=tag, progress=0, 
+                    migration=dict(interval=2, migrants=2),
+                    de_param=dict(pop_size=10, max_gen=max_gen, 
+                                  proc_count=1))
+
+    def testTags(self):
+        self.manager.start()
+        source = self.manager.submit(self.job('level_zero', 'run', 10**6))
+        same_tag = self.manager.submit(self.job('level_one', 'run', 100))
+        other_tag = self.manager.submit(self.job('level_one', 'other', 100))
+
+        # level_one never returns less than 1, only accepted migrants of
+        # the level_zero run of the same tag have cost 0
+        self.assertEqual(same_tag.result(30)['minimum'], 0.)
+        self.assertEqual(other_tag.result(30)['minimum'], 1.)
+        self.assertTrue(source.cancel())
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestFarm(_WorkersTestCase):
+
+    def testSameAsSP(self):
+        numpy.random.seed(7)
+        sp = de.DifferentialEvolutionSP(pop_size=30, max_gen=50, f=0.9, 
+                                        cr=0.9)
+        sp_minimum, sp_point = sp.find_min(fn.saddle)
+
+        numpy.random.seed(7)
+        farm = DifferentialEvolutionFarm(self.manager, 'test_functions', 
+                                         'saddle', pop_size=30, max_gen=50,
+                                         f=0.9, cr=0.9, batch_size=7)
+        farm_minimum, farm_point = farm.find_min()
+
+        self.assertEqual(sp_minimum, farm_minimum)
+        self.assertTrue((sp._x == farm._x).all())
+        self.assertEqual(sp.evaluations, farm.evaluations)
+
+    def testRunTasks(self):
+        work_msg = dict(func_module='test_functions', func_name='sphere', 
+                        evaluate=True)
+        x = numpy.arange(10.).reshape(5, 2)
+        results = self.manager.run_tasks(work_msg, [dict(x = x[:3]), 
+                                                    dict(x = x[3:])])
+        self.assertEqual([list(arrays['cost']) for arrays in results],
+                         [[1., 13., 41.], [85., 145.]])
+
+        work_msg['func_name'] = 'missing'
+        self.assertRaises(RuntimeError, self.manager.run_tasks, work_msg,
+                          [dict(x = x)])
+
+        farm = DifferentialEvolutionFarm(self.manager, 'test_functions', 
+                                         'saddle')
+        self.assertRaises(ValueError, farm.find_min_many, [fn.saddle]*2)
+
+
+@unittest.skipIf(zmq is None, 'requires pyzmq')
+class TestWorker(_WorkersTestCase):
+
+    work_count = 1
+
+    def setUp(self):
+        # forked workers inherit the directory of process marks
+        os.environ['DE_TEST_PIDS'] = tempfile.mkdtemp()
+        super(TestWorker, self).setUp()
+
+    def tearDown(self):
+        super(TestWorker, self).tearDown()
+        shutil.rmtree(os.environ.pop('DE_TEST_PIDS'))
+
+    def testReuse(self):
+        job = dict(func_module='unittest_dist', func_name='marked_sphere',
+                   de_param=dict(pop_size=20, max_gen=30, proc_count=2))
+        for cr in (0.9, 0.1):
+            job['de_param']['cr'] = cr
+            result = self.manager.submit(job).result(timeout=30)
+            self.assertEqual(result['stop_reason'], 'max_gen')
+
+        # both tasks ran on the same two pool processes, forked by the
+        # compute process, not by the worker process
+        path = os.environ['DE_TEST_PIDS']
+        parents = [open(os.path.join(path, pid)).read() 
+                   for pid in os.listdir(path)]
+        self.assertEqual(len(parents), 2)
+        self.assertEqual(len(set(parents)), 1)
+        self.assertNotEqual(parents[0], str(self.proc_group[0].pid))
+
+    def testCancelQueued(self):
+        self.manager.start()
+        running = self.manager.submit(dict(
+            func_module='test_functions', func_name='saddle', 
+            de_param=dict(pop_size=20, max_gen=10**6, proc_count=1)))
+        queued = self.manager.submit(dict(
+            func_module='unittest_dist', func_name='marked_sphere',
+            de_param=dict(pop_size=20, max_gen=30, proc_count=1)))
+
+        # both are prefetched by the worker, cancel the queued one once
+        # the running one reports progress
+        start = time.time()
+        while running.best is None and time.time() - start < 5.:
+            time.sleep(0.01)
+        self.assertFalse(self.manager.scheduler.is_pending(queued._task))
+        self.assertTrue(queued.cancel())
+        self.assertTrue(running.cancel())
+
+        # the worker skips it and its credit comes back
+        job = dict(func_module='test_functions', func_name='saddle', 
+                   de_param=dict(pop_size=20, max_gen=30, proc_count=1))
+        self.assertEqual(self.manager.submit(job).result(30)['stop_reason'],
+                         'max_gen')
+        self.assertEqual(os.listdir(os.environ['DE_TEST_PIDS']), [])
+        self.assertRaises(RuntimeError, queued.result)
+
+
+    def testTargetCancelsQueued(self):
+        self.manager.start()
+        first = self.manager.submit(dict(
+            func_module='test_functions', func_name='saddle', tag='run',
+            target_cost=1e30, progress=1,
+            de_param=dict(pop_size=20, max_gen=10**6, proc_count=1)))
+        queued = self.manager.submit(dict(
+            func_module='unittest_dist', func_name='marked_sphere', 
+            tag='run', de_param=dict(pop_size=20, max_gen=30, 
+                                     proc_count=1)))
+
+        # the first report reaches the target and stops the whole tag,
+        # the prefetched job never starts
+        self.assertEqual(first.result(30)['stop_reason'], 'cancelled')
+        self.assertRaises(RuntimeError, queued.result, 30)
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(os.listdir(os.environ['DE_TEST_PIDS']), [])
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestTransport))
+   suite.addTest(unittest.makeSuite(TestScheduler))
+   suite.addTest(unittest.makeSuite(TestManager))
+   suite.addTest(unittest.makeSuite(TestMigration))
+   suite.addTest(unittest.makeSuite(TestFarm))
+   suite.addTest(unittest.makeSuite(TestWorker))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
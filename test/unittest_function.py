@@ -0,0 +1,47 @@
+import unittest
+import numpy
+
+import de
+import test_functions as fn
+
+
+class TestFunction(unittest.TestCase):
+
+    def testCache(self):
+        sphere = de.Function(fn.func1, 2, (-5.12,)*2, (5.12,)*2, 
+                             cache_size=2)
+        self.assertEqual(list(sphere.batch([[1, 1], [2, 2], [1, 1]])), 
+                         [2, 8, 2])
+        self.assertEqual((sphere.cache_hits, sphere.cache_misses), (1, 2))
+        self.assertEqual(sphere((3, 3)), 18)
+        self.assertEqual(sphere((2, 2)), 8)
+        # (1, 1) was evicted by (3, 3)
+        self.assertEqual(sphere((1, 1)), 2)
+        self.assertEqual((sphere.cache_hits, sphere.cache_misses), (2, 4))
+        sphere.cache_clear()
+        self.assertEqual((sphere.cache_hits, sphere.cache_misses), (0, 0))
+
+    def testCacheQuantum(self):
+        step = de.Function(fn.func3, 5, (-5.12,)*5, (5.12,)*5, 
+                           cache_size=1000, cache_quantum=0.5)
+        step.batch([[0.1]*5, [0.2]*5, [0.3]*5, [1.]*5])
+        self.assertEqual((step.cache_hits, step.cache_misses), (1, 3))
+
+        # coarse cells of a seeded run are always revisited
+        numpy.random.seed(11)
+        step.cache_clear()
+        diffevol = de.DifferentialEvolutionSP(pop_size=50, max_gen=100,
+                                              f=0.9, cr=0)
+        diffevol.find_min(step)
+        self.assertEqual(step.cache_hits + step.cache_misses, 
+                         diffevol.evaluations)
+        self.assertGreater(step.cache_hits, 0)
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestFunction))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
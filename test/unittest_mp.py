@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 import unittest
+import numpy
 
 import de
 import test_functions as fn
@@ -24,6 +28,12 @@ class TestDifferentialEvolutionMP(unittest.TestCase):
         minimum, point = diffevol.find_min(fn.sphere)
         self.assertResult(minimum, point, fn.sphere_result)
 
+    def testSphereVectorized(self):
+        diffevol = de.DifferentialEvolutionMP(pop_size=20, f=0.9, cr=0.1,
+                                              proc_count = 2)
+        minimum, point = diffevol.find_min(fn.sphere_vec)
+        self.assertResult(minimum, point, fn.sphere_result)
+
     def testSaddle(self):
         self.assertIsInstance(fn.saddle, de.Function)
         self.assertIsInstance(fn.saddle_result, fn.FunctionResult)
@@ -48,6 +58,131 @@ class TestDifferentialEvolutionMP(unittest.TestCase):
         minimum, point = diffevol.find_min(fn.griewangk)
         self.assertResult(minimum, point, fn.griewangk_result)
 
+    def testSaddleMigration(self):
+        for topology in de.multiprocess.TOPOLOGIES:
+            for replacement in de.multiprocess.REPLACEMENTS:
+                diffevol = de.DifferentialEvolutionMP(pop_size=40, f=0.9, 
+                                                      cr=0.9, proc_count = 4,
+                                                      migration_interval=10,
+                                                      migrants=2,
+                                                      topology=topology,
+                                                      replacement=replacement)
+                minimum, point = diffevol.find_min(fn.saddle)
+                self.assertResult(minimum, point, fn.saddle_result)
+
+    def testMigrationParameters(self):
+        self.assertRaises(ValueError, de.DifferentialEvolutionMP, 
+                          migration_interval=-1)
+        self.assertRaises(ValueError, de.DifferentialEvolutionMP, migrants=0)
+        self.assertRaises(ValueError, de.DifferentialEvolutionMP, 
+                          topology='star')
+        self.assertRaises(ValueError, de.DifferentialEvolutionMP, 
+                          replacement='best')
+
+    def testStopCriteria(self):
+        diffevol = de.DifferentialEvolutionMP(pop_size=20, f=0.9, cr=0.1,
+                                              proc_count = 2, 
+                                              target_cost=1e-8)
+        minimum, point = diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reasons, ['target_cost']*2)
+        self.assertEqual(diffevol.stop_reason, 'target_cost')
+        self.assertLessEqual(minimum, 1e-8)
+
+        diffevol = de.DifferentialEvolutionMP(pop_size=20, proc_count = 2,
+                                              max_evals=500)
+        diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'max_evals')
+        self.assertLessEqual(diffevol.evaluations, 500)
+
+    def testStrategy(self):
+        diffevol = de.DifferentialEvolutionMP(pop_size=40, f=0.9, cr=0.9,
+                                              proc_count = 2,
+                                              strategy='current-to-pbest/1',
+                                              crossover='exp', p_best=0.2)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testAdaptation(self):
+        diffevol = de.DifferentialEvolutionMP(pop_size=40, proc_count = 2,
+                                              adaptation='shade')
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+        self.assertRaises(ValueError, de.DifferentialEvolutionMP, 
+                          pop_size=40, min_pop_size=10)
+
+    def testPolish(self):
+        diffevol = de.DifferentialEvolutionMP(pop_size=40, max_gen=30,
+                                              f=0.9, cr=0.9, proc_count = 2,
+                                              polish=1)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testLivePopulation(self):
+        snapshots = []
+        def observer(stats):
+            x, cost = diffevol.population()
+            snapshots.append((numpy.isfinite(cost).all(), 
+                              float(cost.min()), stats['best_cost']))
+        diffevol = de.DifferentialEvolutionMP(pop_size=40, f=0.9, cr=0.9,
+                                              max_gen=200, proc_count = 2,
+                                              observer=observer,
+                                              observer_interval=20)
+        self.assertEqual(diffevol.population(), None)
+        minimum, point = diffevol.find_min(fn.saddle)
+        x, cost = diffevol.population()
+        self.assertEqual(x.shape, (40, 2))
+        self.assertEqual(minimum, cost.min())
+        self.assertFalse(numpy.may_share_memory(point, x))
+        for finite, live_best, best_cost in snapshots:
+            self.assertTrue(finite)
+            self.assertLessEqual(live_best, best_cost)
+
+        # same shape, the next run evolves in the same shared memory
+        diffevol.observer = None
+        diffevol.find_min(fn.saddle)
+        self.assertTrue(numpy.may_share_memory(diffevol.population()[0], x))
+        self.assertEqual(cost.min(), diffevol.population()[1].min())
+
+    def testObserver(self):
+        reports = []
+        def observer(stats):
+            reports.append(stats)
+            return stats['generations'] >= 50
+        diffevol = de.DifferentialEvolutionMP(pop_size=40, proc_count=2,
+                                              observer=observer,
+                                              observer_interval=10)
+        diffevol.find_min(fn.sphere_vec)
+        self.assertEqual(diffevol.stop_reasons, ['cancelled']*2)
+        self.assertLess(diffevol.generations, diffevol.max_gen)
+        for stats in reports:
+            islands = [island['island'] for island in stats['islands']]
+            self.assertIn(islands, ([0], [1], [0, 1]))
+            self.assertEqual(stats['evaluations'], 
+                             sum(island['evaluations'] 
+                                 for island in stats['islands']))
+        self.assertEqual(reports[-1]['best_cost'],
+                         min(island['best_cost'] 
+                             for island in reports[-1]['islands']))
+
+    def testCheckpointResume(self):
+        path = tempfile.mkdtemp()
+        try:
+            diffevol = de.DifferentialEvolutionMP(pop_size=40, max_gen=50,
+                                                  f=0.9, cr=0.9, 
+                                                  proc_count = 2,
+                                                  checkpoint=path)
+            diffevol.find_min(fn.saddle)
+            self.assertEqual(sorted(os.listdir(path)), 
+                             ['island0', 'island1'])
+
+            diffevol.max_gen = 1000
+            minimum, point = diffevol.resume(fn.saddle)
+            self.assertResult(minimum, point, fn.saddle_result)
+            self.assertEqual(diffevol.generations, 1000)
+            self.assertEqual(diffevol.evaluations, 40*1001)
+        finally:
+            shutil.rmtree(path)
+
 
 def suite():
    suite = unittest.TestSuite()
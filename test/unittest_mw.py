@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+import unittest
+import numpy
+
+import de
+import test_functions as fn
+
+
+class TestDifferentialEvolutionMW(unittest.TestCase):
+
+    def assertResult(self, minimum, point, func_res):
+        """
+        Check if minimum has accuracy to the desired decimal places 
+        Check if mimimum point is within the accuracy bounds
+        """
+        self.assertAlmostEqual(minimum, func_res.minimum, func_res.places)
+        for i in range(len(point)):
+            self.assertGreater(point[i], func_res.lower[i])
+            self.assertLess(point[i], func_res.upper[i])
+
+    def testSaddle(self):
+        diffevol = de.DifferentialEvolutionMW(pop_size=40, f=0.9, cr=0.9,
+                                              proc_count = 3)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testGriewangk(self):
+        diffevol = de.DifferentialEvolutionMW(pop_size=90, f=0.5, cr=0.2,
+                                              proc_count = 2)
+        minimum, point = diffevol.find_min(fn.griewangk)
+        self.assertResult(minimum, point, fn.griewangk_result)
+
+    def testSameAsSP(self):
+        numpy.random.seed(7)
+        sp = de.DifferentialEvolutionSP(pop_size=30, max_gen=200, f=0.9, 
+                                        cr=0.9)
+        sp_minimum, sp_point = sp.find_min(fn.saddle)
+
+        numpy.random.seed(7)
+        mw = de.DifferentialEvolutionMW(pop_size=30, max_gen=200, f=0.9, 
+                                        cr=0.9, proc_count = 4)
+        mw_minimum, mw_point = mw.find_min(fn.saddle)
+
+        self.assertEqual(sp_minimum, mw_minimum)
+        self.assertTrue((sp_point == mw_point).all())
+        self.assertTrue((sp._x == mw._x).all())
+        self.assertEqual(sp.evaluations, mw.evaluations)
+
+    def testCheckpointResume(self):
+        path = tempfile.mkdtemp()
+        try:
+            numpy.random.seed(3)
+            sp = de.DifferentialEvolutionSP(pop_size=20, max_gen=100)
+            minimum, point = sp.find_min(fn.saddle)
+
+            numpy.random.seed(3)
+            first = de.DifferentialEvolutionMW(pop_size=20, max_gen=40,
+                                               checkpoint=path, 
+                                               proc_count = 2)
+            first.find_min(fn.saddle)
+
+            second = de.DifferentialEvolutionMW(pop_size=20, max_gen=100,
+                                                checkpoint=path, 
+                                                proc_count = 2)
+            resumed_minimum, resumed_point = second.resume(fn.saddle)
+            self.assertEqual(second.generations, 100)
+            self.assertEqual(resumed_minimum, minimum)
+            self.assertTrue((second._x == sp._x).all())
+
+            # the instance of the finished run starts its workers again
+            first.max_gen = 120
+            first.resume(fn.saddle)
+            self.assertEqual(first.generations, 120)
+        finally:
+            shutil.rmtree(path)
+
+    def testLoopRejected(self):
+        self.assertRaises(ValueError, de.DifferentialEvolutionMW, 
+                          vectorized=False)
+        self.assertRaises(ValueError, 
+                          de.DifferentialEvolutionMW().find_min_many, 
+                          [fn.saddle]*2)
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestDifferentialEvolutionMW))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
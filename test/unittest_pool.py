@@ -0,0 +1,73 @@
+import unittest
+
+import de
+import test_functions as fn
+
+
+class TestDifferentialEvolutionPool(unittest.TestCase):
+
+    def assertResult(self, minimum, point, func_res):
+        """
+        Check if minimum has accuracy to the desired decimal places 
+        Check if mimimum point is within the accuracy bounds
+        """
+        self.assertAlmostEqual(minimum, func_res.minimum, func_res.places)
+        for i in range(len(point)):
+            self.assertGreater(point[i], func_res.lower[i])
+            self.assertLess(point[i], func_res.upper[i])
+
+    def testReuse(self):
+        with de.DifferentialEvolutionPool(pop_size=40, f=0.9, cr=0.9,
+                                          proc_count = 2) as diffevol:
+            minimum, point = diffevol.find_min(fn.saddle)
+            self.assertResult(minimum, point, fn.saddle_result)
+            proc_group = list(diffevol._proc_group)
+            saddle_point = point
+
+            diffevol.cr = 0.1
+            minimum, point = diffevol.find_min(fn.sphere)
+            self.assertResult(minimum, point, fn.sphere_result)
+            self.assertEqual(diffevol._proc_group, proc_group)
+            # returned points are copies, not views of shared memory
+            self.assertResult(0., saddle_point, fn.saddle_result)
+
+            # different dim starts new processes
+            diffevol.pop_size = 50
+            diffevol.cr = 0
+            minimum, point = diffevol.find_min(fn.step)
+            self.assertResult(minimum, point, fn.step_result)
+            self.assertNotEqual(diffevol._proc_group, proc_group)
+        self.assertEqual(diffevol._proc_group, [])
+
+    def testObserver(self):
+        reports = []
+        def observer(stats):
+            reports.append(stats)
+            return stats['generations'] >= 20
+        with de.DifferentialEvolutionPool(pop_size=40, proc_count = 2,
+                                          observer=observer,
+                                          observer_interval=10) as diffevol:
+            for i in range(2):
+                diffevol.find_min(fn.sphere_vec)
+                self.assertEqual(diffevol.stop_reasons, ['cancelled']*2)
+                self.assertLess(diffevol.generations, diffevol.max_gen)
+        self.assertEqual(reports[-1]['evaluations'],
+                         sum(island['evaluations']
+                             for island in reports[-1]['islands']))
+
+    def testError(self):
+        with de.DifferentialEvolutionPool(pop_size=6, proc_count = 2) as \
+                diffevol:
+            self.assertRaises(RuntimeError, diffevol.find_min, fn.sphere)
+            diffevol.pop_size = 20
+            minimum, point = diffevol.find_min(fn.sphere)
+            self.assertResult(minimum, point, fn.sphere_result)
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestDifferentialEvolutionPool))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()
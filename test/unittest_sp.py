@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 import unittest
+import numpy
 
 import de
 import test_functions as fn
@@ -23,6 +27,11 @@ class TestDifferentialEvolutionSP(unittest.TestCase):
         minimum, point = diffevol.find_min(fn.sphere)
         self.assertResult(minimum, point, fn.sphere_result)
 
+    def testSphereVectorized(self):
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, f=0.9, cr=0.1)
+        minimum, point = diffevol.find_min(fn.sphere_vec)
+        self.assertResult(minimum, point, fn.sphere_result)
+
     def testSaddle(self):
         self.assertIsInstance(fn.saddle, de.Function)
         self.assertIsInstance(fn.saddle_result, fn.FunctionResult)
@@ -44,6 +53,326 @@ class TestDifferentialEvolutionSP(unittest.TestCase):
         minimum, point = diffevol.find_min(fn.griewangk)
         self.assertResult(minimum, point, fn.griewangk_result)
 
+    def testSaddleLoop(self):
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, f=0.9, cr=0.9,
+                                              vectorized=False)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testUniqueIndexMatrix(self):
+        diffevol = de.DifferentialEvolutionSP(pop_size=5)
+        idx = diffevol._unique_index_matrix(5, 4)
+        self.assertEqual(idx.shape, (5, 4))
+        for i in range(5):
+            self.assertEqual(sorted(idx[i]), 
+                             [k for k in range(5) if k != i])
+        self.assertRaises(ValueError, diffevol._unique_index_matrix, 3, 3)
+
+    def testStrategies(self):
+        evaluations = {}
+        for strategy in ('rand/1', 'best/1', 'current-to-best/1', 'rand/2',
+                         'current-to-pbest/1'):
+            for crossover in ('bin', 'exp'):
+                numpy.random.seed(0)
+                diffevol = de.DifferentialEvolutionSP(pop_size=40, f=0.9, 
+                                                      cr=0.9, 
+                                                      strategy=strategy,
+                                                      crossover=crossover)
+                minimum, point = diffevol.find_min(fn.saddle)
+                self.assertResult(minimum, point, fn.saddle_result)
+
+                numpy.random.seed(0)
+                diffevol.target_cost = 1e-7
+                diffevol.find_min(fn.saddle)
+                evaluations[strategy, crossover] = diffevol.evaluations
+        self.assertLess(evaluations['best/1', 'bin'], 
+                        evaluations['rand/1', 'bin'])
+
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          strategy='rand/3')
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          crossover='uniform')
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          strategy='best/1', vectorized=False)
+
+    def testExpCrossover(self):
+        diffevol = de.DifferentialEvolutionSP(crossover='exp')
+        self.assertEqual(diffevol._cross(50, 4, 0.).sum(axis=1).tolist(), 
+                         [1]*50)
+        self.assertTrue(diffevol._cross(50, 4, 1.).all())
+        for row in diffevol._cross(50, 6, 0.5):
+            # one contiguous run, wrapping around the end
+            self.assertLessEqual((numpy.diff(row.astype(int)) != 0).sum() +
+                                 (row[0] != row[-1]), 2)
+
+    def testAdaptation(self):
+        rosenbrock = fn.scalable('rosenbrock', 10)
+        minimums = {}
+        for adaptation in (None, 'jde', 'shade'):
+            numpy.random.seed(1)
+            diffevol = de.DifferentialEvolutionSP(pop_size=50, max_gen=5000,
+                                                  f=0.5, cr=0.9,
+                                                  adaptation=adaptation,
+                                                  max_evals=50000)
+            minimums[adaptation], point = diffevol.find_min(rosenbrock)
+        self.assertLess(minimums['jde'], minimums[None])
+        self.assertLess(minimums['shade'], minimums[None])
+        self.assertEqual(len(diffevol._memory_f), 10)
+        self.assertTrue((diffevol._memory_f > 0).all())
+        self.assertTrue((diffevol._memory_f <= 1).all())
+
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          adaptation='sade')
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          adaptation='jde', vectorized=False)
+
+    def testPopulationReduction(self):
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, max_gen=100,
+                                              min_pop_size=8, 
+                                              adaptation='jde')
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertEqual(diffevol._x.shape, (8, 2))
+        self.assertEqual(len(diffevol._f_ind), 8)
+        self.assertLess(diffevol.evaluations, 40*101)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, max_evals=2000,
+                                              min_pop_size=4)
+        diffevol.find_min(fn.saddle)
+        self.assertEqual(diffevol.stop_reason, 'max_evals')
+        self.assertEqual(len(diffevol._x), 4)
+        self.assertLessEqual(diffevol.evaluations, 2000)
+
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          pop_size=40, min_pop_size=3)
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          pop_size=40, min_pop_size=50)
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          min_pop_size=5, strategy='rand/2')
+
+    def testPolish(self):
+        numpy.random.seed(2)
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, f=0.9, cr=0.9,
+                                              target_cost=1e-7)
+        diffevol.find_min(fn.saddle)
+        plain_evaluations = diffevol.evaluations
+
+        numpy.random.seed(2)
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, max_gen=30, 
+                                              f=0.9, cr=0.9, polish=1)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+        self.assertLess(diffevol.evaluations, plain_evaluations)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, max_gen=50,
+                                              polish=2, polish_interval=10,
+                                              polish_method='compass',
+                                              polish_evals=40)
+        minimum, point = diffevol.find_min(fn.sphere)
+        self.assertResult(minimum, point, fn.sphere_result)
+        self.assertLessEqual(diffevol.evaluations, 20*51 + 6*2*40)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, max_evals=300,
+                                              polish=1)
+        diffevol.find_min(fn.saddle)
+        self.assertEqual(diffevol.stop_reason, 'max_evals')
+        self.assertLessEqual(diffevol.evaluations, 300)
+
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          polish_method='bfgs')
+
+    def testFindMinMany(self):
+        centers = numpy.linspace(-2, 2, 50)
+        def shifted(index, x):
+            return ((x - centers[index].reshape(-1, 1, 1))**2).sum(axis=2)
+        # problem k is bounded around its own minimum (k, k)
+        stack = de.FunctionStack(shifted, 50, 3, 
+                                 centers.reshape(50, 1) - 1.5,
+                                 centers.reshape(50, 1) + 3)
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, f=0.9, cr=0.1,
+                                              target_cost=1e-9)
+        minimums, points = diffevol.find_min_many(stack)
+        self.assertEqual(points.shape, (50, 3))
+        self.assertTrue((minimums <= 1e-9).all())
+        for k in range(50):
+            self.assertAlmostEqual(abs(points[k] - centers[k]).max(), 0, 4)
+        self.assertEqual(diffevol.stop_reasons, ['target_cost']*50)
+        self.assertEqual(diffevol.generations, 
+                         diffevol.problem_generations.max())
+        self.assertEqual(diffevol.evaluations, 
+                         ((diffevol.problem_generations + 1)*20).sum())
+
+        # problems stop on their own, the sphere converges first
+        diffevol = de.DifferentialEvolutionSP(pop_size=40, f=0.9, cr=0.9,
+                                              target_cost=1e-12, max_gen=2000)
+        minimums, points = diffevol.find_min_many([fn.sphere, fn.saddle])
+        self.assertResult(minimums[0], points[0], fn.sphere_result)
+        self.assertResult(minimums[1], points[1], fn.saddle_result)
+        self.assertLess(diffevol.problem_generations[0], 
+                        diffevol.problem_generations[1])
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, max_evals=500)
+        diffevol.find_min_many(stack)
+        self.assertEqual(diffevol.stop_reasons, ['max_evals']*50)
+        self.assertEqual(diffevol.evaluations, 50*500)
+
+        self.assertRaises(ValueError, diffevol.find_min_many, 
+                          [fn.sphere, fn.griewangk])
+        self.assertRaises(ValueError, 
+                          de.DifferentialEvolutionSP(polish=1).find_min_many,
+                          stack)
+        self.assertRaises(ValueError, de.FunctionStack, shifted, 50, 3,
+                          (0, 0), (1, 1))
+
+    def testStopCriteria(self):
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, f=0.9, cr=0.1,
+                                              target_cost=1e-8)
+        minimum, point = diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'target_cost')
+        self.assertLessEqual(minimum, 1e-8)
+        self.assertLess(diffevol.generations, diffevol.max_gen)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, max_evals=500)
+        diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'max_evals')
+        self.assertLessEqual(diffevol.evaluations, 500)
+        self.assertEqual(diffevol.generations, 24)
+        # the initial population alone would exceed the budget
+        self.assertRaises(ValueError, de.DifferentialEvolutionSP, 
+                          pop_size=20, max_evals=19)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, f=0.9, cr=0.1,
+                                              cost_tol=1e-12)
+        diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'cost_tol')
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=50, f=0.9, cr=0,
+                                              stagnation=50)
+        diffevol.find_min(fn.step)
+        self.assertEqual(diffevol.stop_reason, 'stagnation')
+        self.assertLess(diffevol.generations, diffevol.max_gen)
+
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, max_gen=10)
+        diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'max_gen')
+        self.assertEqual(diffevol.evaluations, 220)
+
+        def cancel(diffevol):
+            if diffevol.generations == 5:
+                diffevol.stop_reason = 'cancelled'
+        diffevol = de.DifferentialEvolutionSP(pop_size=20)
+        diffevol._generation_hooks.append(cancel)
+        diffevol.find_min(fn.sphere)
+        self.assertEqual(diffevol.stop_reason, 'cancelled')
+        self.assertEqual(diffevol.generations, 5)
+
+    def testObserver(self):
+        reports = []
+        def observer(stats):
+            reports.append(stats)
+            return stats['generations'] >= 30
+        diffevol = de.DifferentialEvolutionSP(pop_size=20, observer=observer,
+                                              observer_interval=10)
+        diffevol.find_min(fn.sphere_vec)
+        self.assertEqual(diffevol.stop_reason, 'cancelled')
+        self.assertEqual([stats['generations'] for stats in reports], 
+                         [10, 20, 30])
+        self.assertEqual(reports[-1]['evaluations'], 20*31)
+        self.assertLessEqual(reports[-1]['eval_time'], 
+                             reports[-1]['elapsed'])
+        best = [stats['best_cost'] for stats in reports]
+        self.assertEqual(best, sorted(best, reverse=True))
+
+    def testCheckpointResume(self):
+        path = tempfile.mkdtemp()
+        try:
+            numpy.random.seed(3)
+            diffevol = de.DifferentialEvolutionSP(pop_size=20, max_gen=100)
+            minimum, point = diffevol.find_min(fn.saddle)
+
+            numpy.random.seed(3)
+            first = de.DifferentialEvolutionSP(pop_size=20, max_gen=40, 
+                                               checkpoint=path,
+                                               checkpoint_interval=15)
+            first.find_min(fn.saddle)
+            self.assertEqual(first.generations, 40)
+
+            numpy.random.seed(5)
+            second = de.DifferentialEvolutionSP(pop_size=20, max_gen=100, 
+                                                checkpoint=path)
+            resumed_minimum, resumed_point = second.resume(fn.saddle)
+            self.assertEqual(second.generations, 100)
+            self.assertEqual(second.evaluations, diffevol.evaluations)
+            self.assertEqual(resumed_minimum, minimum)
+            self.assertTrue((second._x == diffevol._x).all())
+
+            self.assertRaises(ValueError, 
+                              de.DifferentialEvolutionSP(pop_size=10, 
+                                                         checkpoint=path).resume,
+                              fn.saddle)
+        finally:
+            shutil.rmtree(path)
+
+    def testCheckpointAdaptation(self):
+        for adaptation in ('jde', 'shade'):
+            path = tempfile.mkdtemp()
+            try:
+                numpy.random.seed(3)
+                diffevol = de.DifferentialEvolutionSP(pop_size=20, max_gen=60,
+                                                      adaptation=adaptation)
+                minimum, point = diffevol.find_min(fn.saddle)
+
+                numpy.random.seed(3)
+                first = de.DifferentialEvolutionSP(pop_size=20, max_gen=25,
+                                                   adaptation=adaptation,
+                                                   checkpoint=path)
+                first.find_min(fn.saddle)
+
+                second = de.DifferentialEvolutionSP(pop_size=20, max_gen=60,
+                                                    adaptation=adaptation,
+                                                    checkpoint=path)
+                resumed_minimum, resumed_point = second.resume(fn.saddle)
+                self.assertEqual(resumed_minimum, minimum)
+                self.assertTrue((second._x == diffevol._x).all())
+
+                other = 'shade' if adaptation == 'jde' else 'jde'
+                self.assertRaises(ValueError, 
+                                  de.DifferentialEvolutionSP(
+                                      pop_size=20, adaptation=other,
+                                      checkpoint=path).resume,
+                                  fn.saddle)
+            finally:
+                shutil.rmtree(path)
+
+
+    def testCheckpointReduction(self):
+        path = tempfile.mkdtemp()
+        try:
+            options = dict(pop_size=20, max_gen=60, adaptation='jde', 
+                           min_pop_size=8)
+            numpy.random.seed(3)
+            diffevol = de.DifferentialEvolutionSP(**options)
+            minimum, point = diffevol.find_min(fn.saddle)
+
+            # the observer ends the first run halfway, the population
+            # shrinks while the files keep their shape
+            numpy.random.seed(3)
+            first = de.DifferentialEvolutionSP(
+                checkpoint=path, checkpoint_interval=1, 
+                observer=lambda stats: stats['generations'] >= 30, 
+                **options)
+            first.find_min(fn.saddle)
+            self.assertLess(len(first._x), 20)
+            self.assertEqual(numpy.load(os.path.join(path, 'x.npy')).shape,
+                             (2, 20, 2))
+
+            second = de.DifferentialEvolutionSP(checkpoint=path, **options)
+            resumed_minimum, resumed_point = second.resume(fn.saddle)
+            self.assertEqual(second.generations, 60)
+            self.assertEqual(resumed_minimum, minimum)
+            self.assertTrue((second._x == diffevol._x).all())
+        finally:
+            shutil.rmtree(path)
+
 
 def suite():
    suite = unittest.TestSuite()
@@ -1,11 +1,32 @@
 import unittest
+import unittest_function
 import unittest_sp
 import unittest_mp
+import unittest_pool
+import unittest_mw
+import unittest_as
+import unittest_cc
+import unittest_tp
+import unittest_dist
 
+suite_function = unittest_function.suite()
 suite_sp = unittest_sp.suite()
 suite_mp = unittest_mp.suite()
+suite_pool = unittest_pool.suite()
+suite_mw = unittest_mw.suite()
+suite_as = unittest_as.suite()
+suite_cc = unittest_cc.suite()
+suite_tp = unittest_tp.suite()
+suite_dist = unittest_dist.suite()
 
 suite = unittest.TestSuite()
+suite.addTest(suite_function)
 suite.addTest(suite_sp)
 suite.addTest(suite_mp)
+suite.addTest(suite_pool)
+suite.addTest(suite_mw)
+suite.addTest(suite_as)
+suite.addTest(suite_cc)
+suite.addTest(suite_tp)
+suite.addTest(suite_dist)
 unittest.TextTestRunner(verbosity=3).run(suite)
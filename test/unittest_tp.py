@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import numpy
+
+import de
+import test_functions as fn
+
+
+class TestDifferentialEvolutionTP(unittest.TestCase):
+
+    def assertResult(self, minimum, point, func_res):
+        """
+        Check if minimum has accuracy to the desired decimal places 
+        Check if mimimum point is within the accuracy bounds
+        """
+        self.assertAlmostEqual(minimum, func_res.minimum, func_res.places)
+        for i in range(len(point)):
+            self.assertGreater(point[i], func_res.lower[i])
+            self.assertLess(point[i], func_res.upper[i])
+
+    def testSaddle(self):
+        diffevol = de.DifferentialEvolutionTP(pop_size=40, f=0.9, cr=0.9,
+                                              thread_count = 3)
+        minimum, point = diffevol.find_min(fn.saddle)
+        self.assertResult(minimum, point, fn.saddle_result)
+
+    def testSameAsSP(self):
+        numpy.random.seed(7)
+        sp = de.DifferentialEvolutionSP(pop_size=30, max_gen=200, f=0.9, 
+                                        cr=0.9)
+        sp_minimum, sp_point = sp.find_min(fn.sphere_vec)
+
+        numpy.random.seed(7)
+        tp = de.DifferentialEvolutionTP(pop_size=30, max_gen=200, f=0.9, 
+                                        cr=0.9, thread_count = 4)
+        tp_minimum, tp_point = tp.find_min(fn.sphere_vec)
+
+        self.assertEqual(sp_minimum, tp_minimum)
+        self.assertTrue((sp._x == tp._x).all())
+        self.assertEqual(sp.evaluations, tp.evaluations)
+
+    def testConcurrency(self):
+        threads = set()
+        active = [0, 0]
+        lock = threading.Lock()
+        def slow(x):
+            # sleep releases the GIL like NumPy, BLAS or C extensions
+            with lock:
+                threads.add(threading.current_thread().name)
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return (x**2).sum(axis=1)
+        sphere = de.Function(slow, 2, (-5.12,)*2, (5.12,)*2, vectorized=True)
+
+        diffevol = de.DifferentialEvolutionTP(pop_size=20, max_gen=20,
+                                              thread_count = 4)
+        diffevol.find_min(sphere)
+        self.assertGreater(active[1], 1)
+        self.assertEqual(len(threads), 4)
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def testResume(self):
+        path = tempfile.mkdtemp()
+        try:
+            diffevol = de.DifferentialEvolutionTP(pop_size=20, max_gen=30,
+                                                  thread_count = 2,
+                                                  checkpoint=path)
+            diffevol.find_min(fn.sphere_vec)
+            diffevol.max_gen = 60
+            diffevol.resume(fn.sphere_vec)
+            self.assertEqual(diffevol.generations, 60)
+        finally:
+            shutil.rmtree(path)
+
+    def testErrors(self):
+        def fail(x):
+            raise ArithmeticError('bad point')
+        failing = de.Function(fail, 2, (-1,)*2, (1,)*2, vectorized=True)
+        diffevol = de.DifferentialEvolutionTP(thread_count = 2)
+        self.assertRaises(ArithmeticError, diffevol.find_min, failing)
+
+        cached = de.Function(fn.func1, 2, (-1,)*2, (1,)*2, cache_size=10)
+        self.assertRaises(ValueError, diffevol.find_min, cached)
+        self.assertRaises(ValueError, de.DifferentialEvolutionTP, 
+                          vectorized=False)
+        self.assertRaises(ValueError, diffevol.find_min_many, 
+                          [fn.saddle]*2)
+
+
+def suite():
+   suite = unittest.TestSuite()
+   suite.addTest(unittest.makeSuite(TestDifferentialEvolutionTP))
+   return suite
+
+if __name__ == '__main__':
+    unittest.main()